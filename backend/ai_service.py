@@ -1,3 +1,6 @@
+import asyncio
+import hashlib
+import json
 import google.generativeai as genai
 from datetime import datetime, timedelta
 import uuid
@@ -5,90 +8,532 @@ from typing import List, Dict, Any, Optional
 import logging
 import re
 import math
+import time
 from dateutil import parser
 from pymongo import DESCENDING
 
 from config import Config
-from database import get_database
+from database import (
+    get_database, get_recent_work_history, get_cached_questions, save_cached_questions,
+    save_pregenerated_questions, get_history_digest, seed_history_digest, digest_entry
+)
+from cache import TTLCache
+from gemini_governor import (
+    get_gemini_governor, is_quota_error, GeminiBusyError, LatencyWindow,
+    LANE_INTERACTIVE, LANE_BACKGROUND, LANE_TEST
+)
 from models import SessionStatus
+from prompt_context import estimate_tokens, truncate_to_tokens, select_history
 
 logger = logging.getLogger(__name__)
 
+
+class QuestionGenerationError(Exception):
+    """Raised when Gemini produced no questions and the caller asked for no fallback"""
+    pass
+
+
 class AIFollowupService:
     def __init__(self):
         "Initialize AI service with Gemini model"
         if not Config.GOOGLE_API_KEY:
             raise ValueError("Google API key is required")
-            
+        
+        started = time.perf_counter()
         genai.configure(api_key=Config.GOOGLE_API_KEY)
         self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
         self.db = get_database()
+        self.governor = get_gemini_governor()
+        self.init_stats = {
+            "created_at": datetime.now().isoformat(),
+            "construction_seconds": round(time.perf_counter() - started, 4),
+            "warmed_up": False,
+            "warmup_seconds": None,
+            "warmup_error": None
+        }
+        # Questions for identical prompts are reused instead of calling Gemini again
+        self.question_cache = TTLCache(maxsize=Config.QUESTION_CACHE_SIZE, ttl=Config.QUESTION_CACHE_TTL)
+        self.question_cache_counters = {"mongo_hits": 0, "mongo_misses": 0, "model_calls": 0}
+        # In-flight speculative generations: temp work update ID -> (input hash, task)
+        self._pregeneration_tasks: Dict[str, tuple] = {}
+        self.pregeneration_stats = {
+            "scheduled": 0,
+            "superseded": 0,
+            "persisted": 0,
+            "failed": 0,
+            "ready_hits": 0,
+            "inflight_joins": 0,
+            "misses": 0
+        }
+        self.history_stats = {"digest_hits": 0, "digest_misses": 0}
+        # Recent Gemini latencies decide when an interactive call is hedged
+        self.gemini_latency = LatencyWindow(Config.GEMINI_LATENCY_WINDOW)
+        self.latency_stats = {
+            "hedges_sent": 0,
+            "hedge_wins": 0,
+            "budget_exceeded": 0,
+            "local_fallbacks": 0
+        }
+    
+    async def warm_up(self) -> bool:
+        """
+        Open the Gemini client connection ahead of the first real request
+        Uses count_tokens, which needs no generation quota
+        
+        Returns:
+            True if the model answered
+        """
+        started = time.perf_counter()
+        try:
+            async with self.governor.slot(LANE_TEST):
+                await asyncio.wait_for(
+                    self.model.count_tokens_async("warm-up"),
+                    timeout=Config.GEMINI_TEST_TIMEOUT
+                )
+            self.init_stats["warmed_up"] = True
+            self.init_stats["warmup_error"] = None
+            logger.info("✅ Gemini model warmed up")
+        except asyncio.TimeoutError:
+            self.init_stats["warmup_error"] = f"timed out after {Config.GEMINI_TEST_TIMEOUT}s"
+        except GeminiBusyError as e:
+            self.init_stats["warmup_error"] = str(e)
+        except Exception as e:
+            self.init_stats["warmup_error"] = str(e)
+        
+        self.init_stats["warmup_seconds"] = round(time.perf_counter() - started, 4)
+        if self.init_stats["warmup_error"]:
+            logger.warning(f"⚠️ Gemini warm-up failed: {self.init_stats['warmup_error']}")
+        return self.init_stats["warmed_up"]
+    
+    async def _generate(self, prompt: str, timeout: Optional[float] = None,
+                        lane: int = LANE_INTERACTIVE, json_response: bool = False) -> Optional[str]:
+        """
+        Call Gemini through the async client so the event loop keeps serving
+        other requests while the model responds. Every call is admitted by the
+        Gemini governor; quota errors back the governor off and are retried.
+        
+        Args:
+            prompt: Prompt text
+            timeout: Seconds before the call is abandoned (defaults to GEMINI_TIMEOUT)
+            lane: Governor priority lane
+            json_response: Ask Gemini for a JSON response
+            
+        Returns:
+            Response text
+            
+        Raises:
+            asyncio.TimeoutError: If Gemini did not answer in time
+            GeminiBusyError: If the governor queue wait was exceeded
+        """
+        timeout = timeout or Config.GEMINI_TIMEOUT
+        generation_config = {"response_mime_type": "application/json"} if json_response else None
+        for attempt in range(Config.GEMINI_QUOTA_RETRIES + 1):
+            async with self.governor.slot(lane):
+                started = time.monotonic()
+                try:
+                    response = await asyncio.wait_for(
+                        self.model.generate_content_async(
+                            prompt, generation_config=generation_config, request_options={"timeout": timeout}
+                        ),
+                        timeout=timeout
+                    )
+                except Exception as e:
+                    if not is_quota_error(e):
+                        raise
+                    self.governor.record_quota_error()
+                    if attempt == Config.GEMINI_QUOTA_RETRIES:
+                        raise
+                    continue
+            self.governor.record_success()
+            self.gemini_latency.record(time.monotonic() - started)
+            return response.text
+    
+    @staticmethod
+    def interactive_deadline() -> Optional[float]:
+        """time.monotonic() deadline for an intern waiting on questions (None when QUESTION_LATENCY_BUDGET is off)"""
+        if Config.QUESTION_LATENCY_BUDGET > 0:
+            return time.monotonic() + Config.QUESTION_LATENCY_BUDGET
+        return None
+    
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        """Seconds left before deadline (None when there is no deadline)"""
+        if deadline is None:
+            return None
+        return max(0.0, deadline - time.monotonic())
+    
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the first Gemini call before sending a duplicate"""
+        if len(self.gemini_latency) < Config.GEMINI_HEDGE_MIN_SAMPLES:
+            return Config.GEMINI_HEDGE_DELAY
+        return self.gemini_latency.percentile(Config.GEMINI_HEDGE_PERCENTILE)
+    
+    async def _generate_within(self, prompt: str, deadline: Optional[float],
+                               lane: int = LANE_INTERACTIVE, json_response: bool = False) -> Optional[str]:
+        """
+        Call Gemini within a deadline, hedging slow calls: once the first call
+        has run longer than the configured latency percentile, an identical
+        request is sent and whichever answers first wins
+        
+        Args:
+            prompt: Prompt text
+            deadline: time.monotonic() value by which an answer is needed (None = no budget)
+            lane: Governor priority lane
+            json_response: Ask Gemini for a JSON response
+            
+        Returns:
+            Response text
+            
+        Raises:
+            asyncio.TimeoutError: If no call answered before the deadline
+        """
+        if deadline is None:
+            return await self._generate(prompt, lane=lane, json_response=json_response)
+        
+        def start_call() -> asyncio.Task:
+            timeout = min(self._remaining(deadline), Config.GEMINI_TIMEOUT)
+            return asyncio.create_task(
+                self._generate(prompt, timeout=max(timeout, 0.001), lane=lane, json_response=json_response)
+            )
+        
+        primary = start_call()
+        calls = [primary]
+        error = None
+        try:
+            await asyncio.wait(calls, timeout=min(self.hedge_delay(), self._remaining(deadline)))
+            if (not primary.done() and Config.GEMINI_HEDGING and self._remaining(deadline) > 0
+                    and self.governor.has_spare_capacity()):
+                logger.info("Gemini call is slow, sending a hedged request")
+                self.latency_stats["hedges_sent"] += 1
+                calls.append(start_call())
+            
+            while calls:
+                done, _ = await asyncio.wait(
+                    calls, timeout=self._remaining(deadline), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise asyncio.TimeoutError()
+                for call in done:
+                    calls.remove(call)
+                    if call.exception() is None:
+                        if call is not primary:
+                            self.latency_stats["hedge_wins"] += 1
+                        return call.result()
+                    error = call.exception()
+            raise error
+        finally:
+            for call in calls:
+                call.cancel()
+        
+    async def generate_followup_questions(self, intern_id: str, work_update_data: Optional[Dict[str, Any]] = None,
+                                          lane: int = LANE_INTERACTIVE, deadline: Optional[float] = None,
+                                          fallback: bool = True, use_cache: bool = True) -> Optional[List[str]]:
+        """
+        Generate follow-up questions based on current work update and history (updated for ProHub integration)
+        
+        Generation runs until deadline (interactive callers pass
+        interactive_deadline()); when it runs out (or Gemini fails) questions
+        are built locally from the work update and yesterday's plans.
+        
+        Args:
+            intern_id: Intern ID
+            work_update_data: Current work update (description/challenges/plans)
+            lane: Governor priority lane
+            deadline: time.monotonic() value by which questions are needed
+                (None: only the Gemini timeout applies, as for background jobs)
+            fallback: Return local questions on failure instead of None
+            use_cache: Reuse questions cached for an identical prompt
+            
+        Returns:
+            List of questions, or None on failure when fallback is False
+        """
+        question_sets = await self._generate_question_sets(
+            intern_id, work_update_data, lane=lane, deadline=deadline,
+            fallback=fallback, variants=1, use_cache=use_cache
+        )
+        return question_sets[0] if question_sets else None
+    
+    async def generate_question_sets(self, intern_id: str, work_update_data: Optional[Dict[str, Any]] = None,
+                                     lane: int = LANE_INTERACTIVE, deadline: Optional[float] = None,
+                                     fallback: bool = True, use_cache: bool = True) -> Optional[List[List[str]]]:
+        """
+        Generate question sets in a single model call
+        Pre-generation (the background lane) asks for QUESTION_VARIANTS sets,
+        so the regenerate endpoint can serve the extras; interactive callers
+        ask for one set to keep the intern's wait short.
+        
+        Returns:
+            Question sets with the primary set first, or None on failure when fallback is False
+        """
+        variants = max(1, Config.QUESTION_VARIANTS) if lane == LANE_BACKGROUND else 1
+        return await self._generate_question_sets(
+            intern_id, work_update_data, lane=lane, deadline=deadline,
+            fallback=fallback, variants=variants, use_cache=use_cache
+        )
+    
+    async def _generate_question_sets(self, intern_id: str, work_update_data: Optional[Dict[str, Any]],
+                                      lane: int, deadline: Optional[float], fallback: bool,
+                                      variants: int, use_cache: bool) -> Optional[List[List[str]]]:
+        """
+        Ask Gemini for variants question sets (one set uses the numbered
+        free-text format, several use JSON)
         
-    async def generate_followup_questions(self, intern_id: str, work_update_data: Optional[Dict[str, Any]] = None) -> List[str]:
-        "Generate follow-up questions based on current work update and history (updated for ProHub integration)"
+        Returns:
+            Question sets with the primary set first (a single locally built
+            set on failure), or None on failure when fallback is False
+        """
+        recent_docs = []
         try:
             logger.info(f"Starting AI question generation for intern: {intern_id}")
             
-            # Get intern's recent work updates (last 7 days) for context
-            week_ago = datetime.now() - timedelta(days=7)
-            
-            # Query BOTH permanent AND temporary collections using internId
-            work_updates_collection = self.db[Config.WORK_UPDATES_COLLECTION]
-            temp_updates_collection = self.db[Config.TEMP_WORK_UPDATES_COLLECTION]
-            
-            # Get permanent work updates
-            permanent_cursor = work_updates_collection.find({"internId": intern_id})
-            permanent_updates = await permanent_cursor.to_list(None)
-            
-            # Get temporary work updates  
-            temp_cursor = temp_updates_collection.find({"internId": intern_id})
-            temp_updates = await temp_cursor.to_list(None)
-            
-            # Combine both collections
-            all_work_updates = permanent_updates + temp_updates
-            
-            # Filter and sort in memory
-            filtered_docs = []
-            for doc in all_work_updates:
-                timestamp = self._extract_timestamp(doc)
-                if timestamp and timestamp > week_ago:
-                    filtered_docs.append(doc)
-            
-            # Sort by timestamp (newest first) and limit to 10
-            filtered_docs.sort(key=lambda x: self._extract_timestamp(x) or datetime.min, reverse=True)
-            recent_docs = filtered_docs[:10]
+            # Intern's recent work updates (last 7 days, newest 10) and latest plans
+            recent_docs, latest_plans = await asyncio.wait_for(
+                self._get_work_history(intern_id),
+                timeout=self._remaining(deadline)
+            )
             
-            logger.info(f"Found {len(recent_docs)} work updates in last 7 days (out of {len(all_work_updates)} total from both collections)")
+            logger.info(f"Found {len(recent_docs)} work updates in last {Config.HISTORY_DIGEST_DAYS} days")
             
             # Build context from current work update and history
             current_context = self._build_current_work_context(work_update_data) if work_update_data else ""
-            history_context = self._build_work_history_context(recent_docs) if recent_docs else ""
+            history_context = self._build_work_history_context(
+                recent_docs, relevant_to=self._work_update_text(work_update_data)
+            ) if recent_docs else ""
             
             # Generate AI prompt
-            prompt = self._build_ai_prompt(current_context, history_context, recent_docs)
+            prompt = self._build_ai_prompt(current_context, history_context, recent_docs, latest_plans,
+                                           variants=variants)
+            logger.info(f"Prompt size: ~{estimate_tokens(prompt)} tokens")
+            
+            # Identical prompt (resubmission or client retry): reuse its questions
+            prompt_hash = self._prompt_hash(prompt)
+            cached_sets = await self._get_cached_question_sets(prompt_hash) if use_cache else None
+            if cached_sets:
+                logger.info(f"Using cached questions for prompt {prompt_hash[:12]}")
+                return cached_sets
             
             logger.info("Sending request to Gemini AI...")
-            response = self.model.generate_content(prompt)
+            self.question_cache_counters["model_calls"] += 1
+            response_text = await self._generate_within(prompt, deadline, lane=lane, json_response=variants > 1)
             
-            if response.text and response.text.strip():
-                logger.info(f"Received AI response: {response.text[:100]}...")
-                questions = self._parse_questions_from_response(response.text)
+            if response_text and response_text.strip() and variants > 1:
+                logger.info(f"Received AI response: {response_text[:100]}...")
+                question_sets = self._parse_question_sets(response_text)
+                
+                if question_sets:
+                    logger.info(f"Successfully generated {len(question_sets)} AI question sets")
+                    await self._cache_question_sets(prompt_hash, question_sets)
+                    return question_sets
+                else:
+                    logger.warning("AI response had no complete question set, falling back to local questions")
+            elif response_text and response_text.strip():
+                logger.info(f"Received AI response: {response_text[:100]}...")
+                questions = self._parse_questions_from_response(response_text)
                 
                 if len(questions) >= 3:
                     logger.info(f"Successfully generated {len(questions)} AI questions")
-                    return questions
+                    await self._cache_question_sets(prompt_hash, [questions])
+                    return [questions]
                 else:
-                    logger.warning(f"AI generated only {len(questions)} questions, falling back to defaults")
-                    return self._get_default_questions()
+                    logger.warning(f"AI generated only {len(questions)} questions, falling back to local questions")
             else:
-                logger.error("AI response was null or empty, using default questions")
-                return self._get_default_questions()
+                logger.error("AI response was null or empty, using local questions")
                 
+        except asyncio.TimeoutError:
+            if deadline is not None:
+                self.latency_stats["budget_exceeded"] += 1
+                logger.error(f"Question generation exceeded the {Config.QUESTION_LATENCY_BUDGET}s latency budget, using local questions")
+            else:
+                logger.error(f"Gemini did not respond within {Config.GEMINI_TIMEOUT}s, using local questions")
+        except GeminiBusyError as e:
+            logger.error(f"{e}, using local questions")
         except Exception as e:
             logger.error(f"Error generating follow-up questions: {e}")
             import traceback
             logger.error(f"Stack trace: {traceback.format_exc()}")
-            return self._get_default_questions()
+        
+        if not fallback:
+            return None
+        return [self._build_local_questions(work_update_data, recent_docs)]
+    
+    @staticmethod
+    def work_input_hash(intern_id: str, work_update_data: Dict[str, Any]) -> str:
+        """Fingerprint of the inputs questions are generated from"""
+        payload = json.dumps([intern_id, work_update_data], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def schedule_pregeneration(self, temp_id: str, intern_id: str, work_update_data: Dict[str, Any]) -> None:
+        """
+        Start generating questions for a just-submitted work update in the
+        background, so the follow-up start finds them ready
+        
+        Args:
+            temp_id: Temporary work update ID the questions are stored on
+            intern_id: Intern ID
+            work_update_data: Same AI input the follow-up start will use
+        """
+        input_hash = self.work_input_hash(intern_id, work_update_data)
+        running = self._pregeneration_tasks.get(temp_id)
+        if running and not running[1].done():
+            if running[0] == input_hash:
+                return
+            # Resubmitted with new inputs: the old questions are no longer wanted
+            running[1].cancel()
+            self.pregeneration_stats["superseded"] += 1
+        
+        task = asyncio.create_task(self._pregenerate(temp_id, intern_id, work_update_data, input_hash))
+        self._pregeneration_tasks[temp_id] = (input_hash, task)
+        task.add_done_callback(lambda _: self._forget_pregeneration(temp_id, task))
+        self.pregeneration_stats["scheduled"] += 1
+        logger.info(f"Pre-generating follow-up questions for temp update {temp_id}")
+    
+    def _forget_pregeneration(self, temp_id: str, task: asyncio.Task) -> None:
+        entry = self._pregeneration_tasks.get(temp_id)
+        if entry and entry[1] is task:
+            del self._pregeneration_tasks[temp_id]
+        if not task.cancelled():
+            task.exception()
+    
+    async def _pregenerate(self, temp_id: str, intern_id: str,
+                           work_update_data: Dict[str, Any], input_hash: str) -> Optional[List[List[str]]]:
+        """Generate and persist question sets; fallback questions are never stored as ready"""
+        question_sets = await self.generate_question_sets(
+            intern_id, work_update_data=work_update_data, lane=LANE_BACKGROUND, fallback=False
+        )
+        if not question_sets:
+            self.pregeneration_stats["failed"] += 1
+            return None
+        
+        try:
+            if await save_pregenerated_questions(temp_id, question_sets[0], input_hash, alternates=question_sets[1:]):
+                self.pregeneration_stats["persisted"] += 1
+            else:
+                logger.info(f"Temp update {temp_id} changed or expired, pre-generated questions not stored")
+        except Exception as e:
+            logger.warning(f"Could not store pre-generated questions for {temp_id}: {e}")
+        return question_sets
+    
+    async def get_pregenerated_questions(self, temp_work_update: Dict[str, Any], intern_id: str,
+                                         work_update_data: Dict[str, Any],
+                                         deadline: Optional[float] = None) -> Optional[List[List[str]]]:
+        """
+        Get questions generated at submission time, waiting for the
+        in-flight generation if it has not finished yet (at most until deadline)
+        
+        Returns:
+            Question sets (primary first) for exactly these inputs, or None if
+            none were pre-generated
+        """
+        input_hash = self.work_input_hash(intern_id, work_update_data)
+        
+        if temp_work_update.get("aiQuestions") and temp_work_update.get("aiQuestionsInputHash") == input_hash:
+            self.pregeneration_stats["ready_hits"] += 1
+            return [list(temp_work_update["aiQuestions"])] + list(temp_work_update.get("aiAlternateQuestions") or [])
+        
+        running = self._pregeneration_tasks.get(str(temp_work_update["_id"]))
+        if running and running[0] == input_hash:
+            self.pregeneration_stats["inflight_joins"] += 1
+            try:
+                # Shield so a cancelled request does not cancel the shared generation
+                question_sets = await asyncio.wait_for(asyncio.shield(running[1]), timeout=self._remaining(deadline))
+            except asyncio.TimeoutError:
+                logger.warning("Pre-generation did not finish within the latency budget")
+                question_sets = None
+            except asyncio.CancelledError:
+                # Only the superseded generation was cancelled, not this request
+                if not running[1].cancelled():
+                    raise
+                question_sets = None
+            except Exception as e:
+                logger.warning(f"Pre-generation failed, generating again: {e}")
+                question_sets = None
+            if question_sets:
+                return [list(questions) for questions in question_sets]
+        
+        self.pregeneration_stats["misses"] += 1
+        return None
+    
+    @staticmethod
+    def _prompt_hash(prompt: str) -> str:
+        """Content address of a prompt (the model is part of the key)"""
+        return hashlib.sha256(f"{Config.GEMINI_MODEL}\n{prompt}".encode("utf-8")).hexdigest()
+    
+    async def _get_cached_question_sets(self, prompt_hash: str) -> Optional[List[List[str]]]:
+        """Look up question sets in the in-process LRU, then in MongoDB"""
+        question_sets = self.question_cache.get(prompt_hash)
+        if question_sets:
+            return [list(questions) for questions in question_sets]
+        
+        try:
+            question_sets = await get_cached_questions(prompt_hash)
+        except Exception as e:
+            logger.warning(f"Question cache lookup failed: {e}")
+            return None
+        
+        if not question_sets:
+            self.question_cache_counters["mongo_misses"] += 1
+            return None
+        
+        if isinstance(question_sets[0], str):
+            # Cached before question sets: a single flat list of questions
+            question_sets = [question_sets]
+        self.question_cache_counters["mongo_hits"] += 1
+        self.question_cache.set(prompt_hash, [list(questions) for questions in question_sets])
+        return [list(questions) for questions in question_sets]
+    
+    async def _cache_question_sets(self, prompt_hash: str, question_sets: List[List[str]]) -> None:
+        """Remember AI-generated question sets (never defaults) for their prompt"""
+        self.question_cache.set(prompt_hash, [list(questions) for questions in question_sets])
+        try:
+            await save_cached_questions(prompt_hash, question_sets)
+        except Exception as e:
+            logger.warning(f"Could not persist cached questions: {e}")
+    
+    def get_question_cache_stats(self) -> Dict[str, Any]:
+        """Hit rates of the question cache (memory, then MongoDB)"""
+        memory = self.question_cache.stats()
+        lookups = memory["hits"] + memory["misses"]
+        hits = memory["hits"] + self.question_cache_counters["mongo_hits"]
+        return {
+            "memory": memory,
+            **self.question_cache_counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else None
+        }
+    
+    async def _get_work_history(self, intern_id: str) -> tuple:
+        """
+        Recent work history for the prompt, read from the intern's history
+        digest; interns without a digest get one seeded from their finalized
+        daily records (the same records later submissions add to the digest)
+        
+        Returns:
+            Tuple of (newest-first history entries, latest plans made before
+            today or None to derive them from the entries)
+        """
+        digest = await get_history_digest(intern_id)
+        if digest is None:
+            self.history_stats["digest_misses"] += 1
+            docs = await get_recent_work_history(
+                intern_id, days=Config.HISTORY_DIGEST_DAYS, limit=Config.HISTORY_DIGEST_MAX_ENTRIES,
+                include_temp_updates=False
+            )
+            try:
+                await seed_history_digest(
+                    intern_id, [digest_entry(doc, submitted_at=doc.get("submittedAt")) for doc in docs]
+                )
+            except Exception as e:
+                logger.warning(f"Could not seed history digest for {intern_id}: {e}")
+            return docs, None
+        
+        self.history_stats["digest_hits"] += 1
+        cutoff = (datetime.now() - timedelta(days=Config.HISTORY_DIGEST_DAYS)).strftime('%Y-%m-%d')
+        entries = [entry for entry in digest.get("entries", []) if (entry.get("date") or "") > cutoff]
+        
+        # Today's plans are tomorrow's; only earlier plans answer "what they planned"
+        latest = digest.get("latestPlans")
+        today = datetime.now().strftime('%Y-%m-%d')
+        latest_plans = latest["plans"] if latest and cutoff < latest["date"] < today else None
+        return entries, latest_plans
     
     def _extract_timestamp(self, doc: Dict[str, Any]) -> Optional[datetime]:
         "Extract timestamp from document"
@@ -108,31 +553,48 @@ class AIFollowupService:
                     logger.warning(f"Error parsing date string: {date_field}")
         return timestamp
     
+    @staticmethod
+    def _work_update_text(work_data: Optional[Dict[str, Any]]) -> str:
+        """Today's task, challenges and plans as one text (for ranking history)"""
+        if not work_data:
+            return ""
+        return ' '.join(str(work_data.get(field) or '') for field in ('description', 'challenges', 'plans'))
+    
     def _build_current_work_context(self, work_data: Dict[str, Any]) -> str:
         "Build context string from current work update (LogBook field mapping)"
         context_lines = ["CURRENT WORK UPDATE:"]
+        limit = Config.PROMPT_FIELD_TOKEN_LIMIT
         
         # Task description (maps to LogBook's 'task' field)
         task = work_data.get('description', '').strip()  # AI service uses 'description', LogBook uses 'task'
         if task:
-            context_lines.append(f"Work Description: {task}")
+            context_lines.append(f"Work Description: {truncate_to_tokens(task, limit)}")
         
         # Progress/Challenges (maps to LogBook's 'progress' field)
         challenges = work_data.get('challenges', '').strip() if work_data.get('challenges') else None
         if challenges:
-            context_lines.append(f"Challenges Today: {challenges}")
+            context_lines.append(f"Challenges Today: {truncate_to_tokens(challenges, limit)}")
         
         # Plans/Blockers (maps to LogBook's 'blockers' field)
         plans = work_data.get('plans', '').strip() if work_data.get('plans') else None
         if plans:
-            context_lines.append(f"Plans for Tomorrow: {plans}")
+            context_lines.append(f"Plans for Tomorrow: {truncate_to_tokens(plans, limit)}")
         
         context_lines.append("---")
         return '\n'.join(context_lines)
     
-    def _build_work_history_context(self, docs: List[Dict[str, Any]]) -> str:
-        "Build context string from work update history (LogBook field mapping)"
-        context_lines = ["RECENT WORK HISTORY:"]
+    def _build_work_history_context(self, docs: List[Dict[str, Any]], relevant_to: str = "") -> str:
+        """
+        Build context string from work update history (LogBook field mapping)
+        Entries most relevant to today's update are kept in full within
+        PROMPT_HISTORY_TOKEN_BUDGET; the rest are summarized or left out.
+        
+        Args:
+            docs: History documents, newest first
+            relevant_to: Today's work update text to rank entries against
+        """
+        entries = []
+        limit = Config.PROMPT_FIELD_TOKEN_LIMIT
         
         for i, doc in enumerate(docs):
             date_time = self._extract_timestamp(doc)
@@ -152,25 +614,55 @@ class AIFollowupService:
             
             date_str = date_time.strftime('%Y-%m-%d') if date_time else 'Unknown'
             
-            context_lines.append(f"Date: {date_str}")
+            entry_lines = [f"Date: {date_str}"]
             if task:
-                context_lines.append(f"Work: {task}")
+                entry_lines.append(f"Work: {truncate_to_tokens(task, limit)}")
             if progress:
-                context_lines.append(f"Challenges: {progress}")
+                entry_lines.append(f"Challenges: {truncate_to_tokens(progress, limit)}")
             if blockers:
-                context_lines.append(f"Plans: {blockers}")
-            context_lines.append("---")
+                entry_lines.append(f"Plans: {truncate_to_tokens(blockers, limit)}")
+            entry_lines.append("---")
+            
+            summary_lines = [f"Date: {date_str}"]
+            if task:
+                summary_lines.append(f"Work: {truncate_to_tokens(task, Config.PROMPT_SUMMARY_TOKENS)}")
+            summary_lines.append("---")
+            entries.append(('\n'.join(entry_lines), '\n'.join(summary_lines)))
+        
+        selected, counts = select_history(relevant_to, entries, Config.PROMPT_HISTORY_TOKEN_BUDGET)
+        if counts["summarized"] or counts["dropped"]:
+            logger.info(f"Work history trimmed to budget: {counts['full']} full, "
+                        f"{counts['summarized']} summarized, {counts['dropped']} left out")
         
+        context_lines = ["RECENT WORK HISTORY:"] + selected
+        if counts["dropped"]:
+            context_lines.append(f"({counts['dropped']} less related updates not shown)")
         return '\n'.join(context_lines)
     
-    def _build_ai_prompt(self, current_context: str, history_context: str, recent_docs: List[Dict[str, Any]]) -> str:
+    def _build_ai_prompt(self, current_context: str, history_context: str, recent_docs: List[Dict[str, Any]],
+                         latest_plans: Optional[str] = None, variants: int = 1) -> str:
         "Build AI prompt for question generation"
         
         # Extract data for the prompt template
         today_work_update = current_context
-        yesterday_plans = self._extract_yesterday_plans_from_recent_docs(recent_docs)
+        yesterday_plans = truncate_to_tokens(
+            latest_plans or self._extract_yesterday_plans_from_recent_docs(recent_docs),
+            Config.PROMPT_FIELD_TOKEN_LIMIT
+        )
         current_challenges = self._extract_current_challenges(current_context)
         seven_day_history = history_context
+        
+        if variants > 1:
+            task_line = (f"Generate {variants} different sets of exactly 3 simple questions. Each set should "
+                         f"stand on its own and approach today's work from a different angle. Every question should:")
+            response_format = ('Respond with JSON only, in this shape:\n'
+                               '{"question_sets": [["First question", "Second question", "Third question"], ...]}')
+        else:
+            task_line = "Generate exactly 3 simple questions that:"
+            response_format = """Format your response as:
+1. [First simple question] 
+2. [Second simple question]
+3. [Third simple question]"""
 
         prompt = f"""You're helping a supervisor create simple, easy-to-answer follow-up questions for an intern's daily work update.
 
@@ -179,22 +671,19 @@ class AIFollowupService:
 **Current Challenges:** {current_challenges}
 **Recent Work History:** {seven_day_history}
 
-Generate exactly 3 simple questions that:
+{task_line}
 1. Are easy to answer with 1-2 sentences
 2. Sound friendly and conversational to understand progress without being demanding
 3. Focus on today's work specifically 
 4. When says they completed a task,ask them to describe the steps they followed in a general but specific-enough way, so we can understand how the work was approached and verify it was actually done
-7. If {yesterday_plans} exists verify {today_work_update} matches {yesterday_plans} naturally .
+5. If they had plans from yesterday, naturally check whether today's work matches those plans
 
 Avoid questions about:
 - Feelings or emotions
 - Complex technical details
 - Long explanations
 
-Format your response as:
-1. [First simple question] 
-2. [Second simple question]
-3. [Third simple question]"""
+{response_format}"""
 
         return prompt
     
@@ -246,7 +735,39 @@ Format your response as:
         
         return challenges
     
+    def _parse_question_sets(self, response: str) -> List[List[str]]:
+        """
+        Parse a {"question_sets": [[...], ...]} JSON response into distinct
+        sets of 3 questions, skipping incomplete or repeated sets
+        """
+        text = response.strip()
+        if text.startswith("```"):
+            text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+        try:
+            data = json.loads(text)
+        except ValueError:
+            logger.warning("Question sets response was not JSON, parsing it as a single set")
+            questions = self._parse_questions_from_response(response)
+            return [questions] if len(questions) >= 3 else []
+        
+        raw_sets = data.get("question_sets") if isinstance(data, dict) else data
+        question_sets = []
+        seen = set()
+        for raw_set in raw_sets if isinstance(raw_sets, list) else []:
+            if not isinstance(raw_set, list):
+                continue
+            questions = [question.strip() for question in raw_set if isinstance(question, str) and question.strip()]
+            if len(questions) < 3:
+                continue
+            key = tuple(question.lower() for question in questions[:3])
+            if key in seen:
+                continue
+            seen.add(key)
+            question_sets.append(questions[:3])
+        return question_sets
+    
     def _parse_questions_from_response(self, response: str) -> List[str]:
+        """Parse up to 3 questions out of a free-text model response (may return fewer)"""
         questions = []
         logger.info("Parsing AI response for questions...")
         logger.info(f"Full AI response: {response}")
@@ -308,17 +829,60 @@ Format your response as:
         
         logger.info(f"Total questions parsed: {len(questions)}")
         
-        # Ensure exactly 3 questions
+        # At most 3 questions; fewer are returned as-is so the caller treats
+        # the response as a failure instead of caching padded defaults
         if len(questions) > 3:
             questions = questions[:3]
             logger.info("Trimmed to 3 questions")
         elif len(questions) < 3:
-            logger.warning(f"Only {len(questions)} questions parsed after all methods, filling with defaults")
-            # Fill with default questions if we don't have enough
-            defaults = self._get_default_questions()
-            while len(questions) < 3 and len(questions) < len(defaults):
-                questions.append(defaults[len(questions)])
+            logger.warning(f"Only {len(questions)} questions parsed after all methods")
+        
+        return questions
+    
+    @staticmethod
+    def _quote(text: str, limit: int = 80) -> str:
+        """First line of free text, shortened for quoting inside a question"""
+        text = text.strip().splitlines()[0].strip().rstrip('.')
+        if len(text) > limit:
+            text = text[:limit].rsplit(' ', 1)[0] + '...'
+        return text
+    
+    def _build_local_questions(self, work_data: Optional[Dict[str, Any]],
+                               recent_docs: List[Dict[str, Any]]) -> List[str]:
+        """
+        Questions built without Gemini from today's task/progress/blockers and
+        yesterday's plans, used when generation fails or runs out of time
+        """
+        self.latency_stats["local_fallbacks"] += 1
+        work_data = work_data or {}
+        task = (work_data.get('description') or '').strip()
+        challenges = (work_data.get('challenges') or '').strip()
+        plans = (work_data.get('plans') or '').strip()
+        yesterday_plans = self._extract_yesterday_plans_from_recent_docs(recent_docs)
+        
+        # Placeholders the work update form fills in when a field is left empty
+        if challenges.lower() in ("no challenges faced", "none", "n/a"):
+            challenges = ""
+        if plans.lower() in ("no specific plans", "none", "n/a"):
+            plans = ""
+        if yesterday_plans in ("No previous plans found", "No specific plans"):
+            yesterday_plans = ""
+        
+        questions = []
+        if task:
+            questions.append(f'You worked on "{self._quote(task)}" today. What steps did you follow to get it done?')
+        if yesterday_plans:
+            questions.append(f'Yesterday you planned "{self._quote(yesterday_plans)}". How much of that did you get to today?')
+        if challenges:
+            questions.append(f'You mentioned "{self._quote(challenges)}". How did you handle it, or what help would be useful?')
+        if plans:
+            questions.append(f'For tomorrow you plan "{self._quote(plans)}". What will you start with first?')
         
+        questions = questions[:3]
+        for default in self._get_default_questions():
+            if len(questions) >= 3:
+                break
+            questions.append(default)
         return questions
     
     def _get_default_questions(self) -> List[str]:
@@ -420,9 +984,24 @@ Format your response as:
         """Test method to check if AI is working"""
         try:
             prompt = 'Generate a simple test response: "AI is working"'
-            response = self.model.generate_content(prompt)
-            logger.info(f"AI Test Response: {response.text}")
-            return response.text is not None and response.text.strip()
+            response_text = await self._generate(prompt, timeout=Config.GEMINI_TEST_TIMEOUT, lane=LANE_TEST)
+            logger.info(f"AI Test Response: {response_text}")
+            return response_text is not None and response_text.strip()
+        except asyncio.TimeoutError:
+            logger.error(f"AI Test Failed: no response within {Config.GEMINI_TEST_TIMEOUT}s")
+            return False
         except Exception as e:
             logger.error(f"AI Test Failed: {e}")
-            return False
\ No newline at end of file
+            return False
+
+
+# Singleton instance reused by every request (created in the FastAPI lifespan)
+_ai_service = None
+
+def get_ai_followup_service() -> AIFollowupService:
+    """Get singleton instance of the AI follow-up service, creating it on first use"""
+    global _ai_service
+    if _ai_service is None:
+        _ai_service = AIFollowupService()
+        logger.info(f"AI service created in {_ai_service.init_stats['construction_seconds']}s")
+    return _ai_service
@@ -0,0 +1,134 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any, Tuple, Optional
+
+from cache import TTLCache
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class SessionTokenError(Exception):
+    """Raised when a session token is malformed, tampered with, expired or revoked"""
+    pass
+
+
+class SessionTokenUnavailableError(SessionTokenError):
+    """Raised when session tokens cannot be issued or checked (no SESSION_TOKEN_SECRET)"""
+    pass
+
+
+# Normalized email -> time its tokens were revoked; entries outlive every token issued before them
+_revoked_emails = TTLCache(maxsize=Config.AUTH_CACHE_SIZE, ttl=Config.SESSION_TOKEN_TTL)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _get_secret() -> bytes:
+    """Get the HMAC signing secret"""
+    if not Config.SESSION_TOKEN_SECRET:
+        raise SessionTokenUnavailableError("SESSION_TOKEN_SECRET is not configured")
+    return Config.SESSION_TOKEN_SECRET.encode("utf-8")
+
+
+def _sign(payload_b64: str) -> str:
+    digest = hmac.new(_get_secret(), payload_b64.encode("ascii"), hashlib.sha256).digest()
+    return _b64encode(digest)
+
+
+def create_session_token(user_info: Dict[str, Any], ttl: Optional[int] = None) -> Tuple[str, datetime]:
+    """
+    Create an HMAC-signed session token for a ProHub-verified intern
+
+    Args:
+        user_info: User info from ProHub authentication
+        ttl: Token lifetime in seconds (defaults to SESSION_TOKEN_TTL)
+
+    Returns:
+        Tuple of (token, expiry datetime)
+    """
+    issued_at = int(time.time())
+    expires_at = issued_at + (ttl or Config.SESSION_TOKEN_TTL)
+
+    payload = {
+        "sub": user_info["intern_id"],
+        "name": user_info.get("name", ""),
+        "email": user_info.get("email", ""),
+        "dept": user_info.get("department", ""),
+        "iat": issued_at,
+        "exp": expires_at
+    }
+    payload_b64 = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+    return f"{payload_b64}.{_sign(payload_b64)}", datetime.fromtimestamp(expires_at)
+
+
+def revoke_session_tokens(email: str) -> None:
+    """
+    Reject every token issued to email so far (e.g. the intern left the roster)
+    Revocations are kept in memory for SESSION_TOKEN_TTL, after which the
+    revoked tokens have expired anyway.
+    """
+    _revoked_emails.set(email.lower(), time.time())
+    logger.info(f"Session tokens revoked for {email}")
+
+
+def verify_session_token(token: str) -> Dict[str, str]:
+    """
+    Validate a session token with pure CPU work (no roster or database access,
+    only the in-memory revocation list)
+
+    Args:
+        token: Token returned by create_session_token
+
+    Returns:
+        User info dictionary in the same shape as ProHub authentication
+
+    Raises:
+        SessionTokenError: If the token is malformed, tampered with, expired or revoked
+        SessionTokenUnavailableError: If SESSION_TOKEN_SECRET is not configured
+    """
+    try:
+        # Tokens are pure base64url; anything else (e.g. non-ASCII) is malformed
+        token.encode("ascii")
+        payload_b64, signature = token.split(".", 1)
+    except (UnicodeError, ValueError):
+        raise SessionTokenError("Malformed session token")
+
+    if not hmac.compare_digest(signature.encode("ascii"), _sign(payload_b64).encode("ascii")):
+        raise SessionTokenError("Invalid session token signature")
+
+    try:
+        payload = json.loads(_b64decode(payload_b64))
+    except Exception:
+        raise SessionTokenError("Malformed session token payload")
+
+    if int(payload.get("exp", 0)) <= time.time():
+        raise SessionTokenError("Session token expired")
+
+    intern_id = str(payload.get("sub", ""))
+    if not intern_id:
+        raise SessionTokenError("Session token has no intern ID")
+
+    revoked_at = _revoked_emails.get(str(payload.get("email", "")).lower())
+    if revoked_at is not None and int(payload.get("iat", 0)) <= revoked_at:
+        raise SessionTokenError("Session token revoked")
+
+    return {
+        "intern_id": intern_id,
+        "email": payload.get("email", ""),
+        "name": payload.get("name", ""),
+        "department": payload.get("dept", ""),
+        "prohub_id": intern_id
+    }
@@ -26,6 +26,40 @@ class Config:
     )
     PROHUB_API_TIMEOUT = int(os.getenv("PROHUB_API_TIMEOUT", "30"))  # Seconds
     PROHUB_CACHE_DURATION = int(os.getenv("PROHUB_CACHE_DURATION", "300"))  # Seconds
+    # Serve the last good roster while refreshing it in the background
+    PROHUB_STALE_WHILE_REVALIDATE = os.getenv("PROHUB_STALE_WHILE_REVALIDATE", "True").lower() == "true"
+    PROHUB_REFRESH_INTERVAL = int(os.getenv("PROHUB_REFRESH_INTERVAL", "240"))  # Seconds
+    PROHUB_MAX_STALE_AGE = int(os.getenv("PROHUB_MAX_STALE_AGE", "3600"))  # Seconds, hard expiry
+    # Pooled HTTP client for ProHub calls
+    PROHUB_HTTP2 = os.getenv("PROHUB_HTTP2", "True").lower() == "true"
+    PROHUB_MAX_CONNECTIONS = int(os.getenv("PROHUB_MAX_CONNECTIONS", "10"))
+    PROHUB_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("PROHUB_MAX_KEEPALIVE_CONNECTIONS", "5"))
+    PROHUB_KEEPALIVE_EXPIRY = float(os.getenv("PROHUB_KEEPALIVE_EXPIRY", "300"))  # Seconds
+    # Parse the roster incrementally (requires ijson) instead of response.json()
+    PROHUB_STREAMING_PARSE = os.getenv("PROHUB_STREAMING_PARSE", "True").lower() == "true"
+    # Roster store shared by workers: "mongo" (one elected refresher) or "local" (in-process)
+    PROHUB_CACHE_BACKEND = os.getenv("PROHUB_CACHE_BACKEND", "mongo").lower()
+    PROHUB_REFRESH_LEASE_TTL = int(os.getenv("PROHUB_REFRESH_LEASE_TTL", "600"))  # Seconds
+    PROHUB_STORE_POLL_INTERVAL = int(os.getenv("PROHUB_STORE_POLL_INTERVAL", "15"))  # Seconds
+    # Circuit breaker and negative lookup cache for ProHub authentication
+    PROHUB_BREAKER_FAILURE_THRESHOLD = int(os.getenv("PROHUB_BREAKER_FAILURE_THRESHOLD", "3"))
+    PROHUB_BREAKER_RESET_TIMEOUT = int(os.getenv("PROHUB_BREAKER_RESET_TIMEOUT", "30"))  # Seconds
+    PROHUB_NEGATIVE_CACHE_TTL = int(os.getenv("PROHUB_NEGATIVE_CACHE_TTL", "60"))  # Seconds
+    PROHUB_NEGATIVE_CACHE_SIZE = int(os.getenv("PROHUB_NEGATIVE_CACHE_SIZE", "10000"))
+    
+    # Per-identity auth result cache used by get_current_intern
+    AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "300"))  # Seconds
+    AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "5000"))
+    
+    # Signed session tokens issued by /api/auth/login
+    # Dedicated signing secret; without it tokens are neither issued nor accepted
+    SESSION_TOKEN_SECRET = os.getenv("SESSION_TOKEN_SECRET")
+    SESSION_TOKEN_TTL = int(os.getenv("SESSION_TOKEN_TTL", "1800"))  # Seconds (30 minutes)
+    
+    # Background health probes served by /health, /health/live and /health/ready
+    HEALTH_CHECK_INTERVAL = int(os.getenv("HEALTH_CHECK_INTERVAL", "15"))  # Seconds
+    HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))  # Seconds per probe
+    HEALTH_READY_MAX_AGE = int(os.getenv("HEALTH_READY_MAX_AGE", "60"))  # Seconds, readiness freshness
     
     # Application Configuration
     DEBUG = os.getenv("DEBUG", "False").lower() == "true"
@@ -34,9 +68,52 @@ class Config:
     WORK_UPDATES_COLLECTION = "dailyrecords"  # Updated to match LogBook
     TEMP_WORK_UPDATES_COLLECTION = "temp_work_updates"
     FOLLOWUP_SESSIONS_COLLECTION = "followup_sessions"
+    PROHUB_SNAPSHOT_COLLECTION = "prohub_roster_snapshots"  # Last good ProHub roster
+    QUESTION_CACHE_COLLECTION = "question_cache"  # Generated questions keyed by prompt hash
+    QUESTION_JOBS_COLLECTION = "question_jobs"  # Queued follow-up question generation jobs
+    HISTORY_DIGEST_COLLECTION = "intern_history_digests"  # Condensed recent history per intern
     
     # AI Model Configuration
     GEMINI_MODEL = "gemini-2.0-flash"  
+    GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "20"))  # Seconds per question generation call
+    GEMINI_TEST_TIMEOUT = float(os.getenv("GEMINI_TEST_TIMEOUT", "10"))  # Seconds per AI test call
+    # Governor all Gemini calls go through (rate, concurrency, queueing, quota backoff)
+    GEMINI_RATE_PER_MINUTE = float(os.getenv("GEMINI_RATE_PER_MINUTE", "60"))  # 0 = no rate limit
+    GEMINI_BURST = int(os.getenv("GEMINI_BURST", "10"))
+    GEMINI_MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_IN_FLIGHT", "8"))
+    GEMINI_MAX_QUEUE_WAIT = float(os.getenv("GEMINI_MAX_QUEUE_WAIT", "10"))  # Seconds
+    GEMINI_QUOTA_BACKOFF = float(os.getenv("GEMINI_QUOTA_BACKOFF", "2"))  # Seconds, doubled per quota error
+    GEMINI_QUOTA_BACKOFF_MAX = float(os.getenv("GEMINI_QUOTA_BACKOFF_MAX", "60"))  # Seconds
+    GEMINI_QUOTA_RETRIES = int(os.getenv("GEMINI_QUOTA_RETRIES", "1"))
+    # Latency budget for interactive question generation (follow-up start)
+    QUESTION_LATENCY_BUDGET = float(os.getenv("QUESTION_LATENCY_BUDGET", "8"))  # Seconds, 0 = no budget
+    GEMINI_HEDGING = os.getenv("GEMINI_HEDGING", "true").lower() == "true"
+    GEMINI_HEDGE_PERCENTILE = float(os.getenv("GEMINI_HEDGE_PERCENTILE", "90"))
+    GEMINI_HEDGE_DELAY = float(os.getenv("GEMINI_HEDGE_DELAY", "3"))  # Seconds, until enough latency samples
+    GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20"))
+    GEMINI_LATENCY_WINDOW = int(os.getenv("GEMINI_LATENCY_WINDOW", "200"))  # Recent calls kept for percentiles
+    # Prompt size limits (estimated tokens, ~4 characters each)
+    PROMPT_HISTORY_TOKEN_BUDGET = int(os.getenv("PROMPT_HISTORY_TOKEN_BUDGET", "800"))
+    PROMPT_FIELD_TOKEN_LIMIT = int(os.getenv("PROMPT_FIELD_TOKEN_LIMIT", "250"))  # Per work update field
+    PROMPT_SUMMARY_TOKENS = int(os.getenv("PROMPT_SUMMARY_TOKENS", "25"))  # Per summarized history entry
+    # Per-intern history digest read by the prompt builder
+    HISTORY_DIGEST_DAYS = int(os.getenv("HISTORY_DIGEST_DAYS", "7"))
+    HISTORY_DIGEST_MAX_ENTRIES = int(os.getenv("HISTORY_DIGEST_MAX_ENTRIES", "10"))
+    # Question sets requested per pre-generation call (interactive calls ask for one);
+    # extras are served by the regenerate endpoint
+    QUESTION_VARIANTS = int(os.getenv("QUESTION_VARIANTS", "3"))
+    # Cache of generated questions for identical prompts (in-process LRU + MongoDB TTL collection)
+    QUESTION_CACHE_TTL = int(os.getenv("QUESTION_CACHE_TTL", "86400"))  # Seconds
+    QUESTION_CACHE_SIZE = int(os.getenv("QUESTION_CACHE_SIZE", "1000"))
+    # Generate questions in the background as soon as a working/WFH update is submitted
+    QUESTION_PREGENERATION = os.getenv("QUESTION_PREGENERATION", "True").lower() == "true"
+    # Question generation job queue (POST /api/followups/start?job=true)
+    QUESTION_JOB_WORKERS = int(os.getenv("QUESTION_JOB_WORKERS", "4"))  # Concurrent jobs per process
+    QUESTION_JOB_POLL_INTERVAL = float(os.getenv("QUESTION_JOB_POLL_INTERVAL", "1"))  # Seconds
+    QUESTION_JOB_LEASE = int(os.getenv("QUESTION_JOB_LEASE", "120"))  # Seconds before a stuck job is retried
+    QUESTION_JOB_MAX_ATTEMPTS = int(os.getenv("QUESTION_JOB_MAX_ATTEMPTS", "3"))
+    QUESTION_JOB_BACKOFF = float(os.getenv("QUESTION_JOB_BACKOFF", "2"))  # Seconds, doubled per retry
+    QUESTION_JOB_RETENTION = int(os.getenv("QUESTION_JOB_RETENTION", "86400"))  # Seconds finished jobs are kept
     
     @classmethod
     def validate_config(cls):
@@ -1,9 +1,12 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import DESCENDING, ASCENDING
+from pymongo import DESCENDING, ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from config import Config
 import logging
 from datetime import datetime, timedelta
 from bson import ObjectId
+import uuid
+from prompt_context import truncate_to_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -121,6 +124,7 @@ async def create_indexes():
         await work_updates.create_index("internId")
         await work_updates.create_index([("internId", 1), ("submittedAt", DESCENDING)])
         await work_updates.create_index([("internId", 1), ("update_date", 1)], unique=True)
+        await work_updates.create_index([("internId", 1), ("date", DESCENDING)])
         
         # Index for tracking incomplete follow-ups
         await work_updates.create_index([("internId", 1), ("followupCompleted", 1)])
@@ -131,6 +135,7 @@ async def create_indexes():
         await temp_work_updates.create_index("internId")
         await temp_work_updates.create_index([("internId", 1), ("update_date", 1)], unique=True)
         await temp_work_updates.create_index([("submittedAt", 1), ("status", 1)])
+        await temp_work_updates.create_index([("internId", 1), ("submittedAt", DESCENDING)])
         
         # Followup sessions indexes using internId
         followup_sessions = database.database[Config.FOLLOWUP_SESSIONS_COLLECTION]
@@ -166,6 +171,28 @@ async def create_indexes():
             ("createdAt", DESCENDING)
         ])
         
+        # Generated questions expire with the question cache TTL
+        question_cache = database.database[Config.QUESTION_CACHE_COLLECTION]
+        await question_cache.create_index(
+            "createdAt",
+            expireAfterSeconds=Config.QUESTION_CACHE_TTL,
+            name="createdAt_question_cache_ttl"
+        )
+        
+        # Question generation jobs: claim order, per-update dedupe, expiry of finished jobs
+        question_jobs = database.database[Config.QUESTION_JOBS_COLLECTION]
+        await question_jobs.create_index([("status", 1), ("availableAt", 1)])
+        await question_jobs.create_index([("status", 1), ("leaseExpiresAt", 1)])
+        await question_jobs.create_index([("tempWorkUpdateId", 1), ("status", 1)])
+        # At most one unfinished (queued or running) job per temp work update
+        await question_jobs.create_index(
+            "tempWorkUpdateId",
+            unique=True,
+            partialFilterExpression={"active": True},
+            name="tempWorkUpdateId_active_question_job_unique"
+        )
+        await question_jobs.create_index("expiresAt", expireAfterSeconds=0, name="expiresAt_question_jobs_ttl")
+        
         logger.info("Database indexes created successfully (ProHub integration with internId)")
         
     except Exception as e:
@@ -274,6 +301,10 @@ async def move_temp_to_permanent(temp_id: str, additional_data: dict = None) ->
         permanent_update = temp_update.copy()
         del permanent_update["_id"]  # Remove temp ID
         
+        # Pre-generated follow-up questions only matter while the update is pending
+        for field in ("aiQuestions", "aiAlternateQuestions", "aiQuestionsInputHash", "aiQuestionsGeneratedAt"):
+            permanent_update.pop(field, None)
+        
         # Add additional data if provided
         if additional_data:
             permanent_update.update(additional_data)
@@ -425,6 +456,365 @@ async def get_database_stats():
         logger.error(f"Failed to get database stats: {e}")
         return None
 
+async def save_roster_snapshot(trainees: list, fetched_at: datetime, validators: dict = None,
+                               record_format: str = None) -> int:
+    """
+    Persist the last good ProHub roster so restarts (and other workers)
+    don't depend on ProHub
+    
+    Returns:
+        The snapshot's new version number
+    """
+    snapshots = database.database[Config.PROHUB_SNAPSHOT_COLLECTION]
+    snapshot = await snapshots.find_one_and_update(
+        {"_id": "latest"},
+        {
+            "$set": {
+                "trainees": trainees,
+                "count": len(trainees),
+                "format": record_format,
+                "fetchedAt": fetched_at,
+                "validators": validators or {}
+            },
+            "$inc": {"version": 1}
+        },
+        projection={"version": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    logger.info(f"Saved ProHub roster snapshot v{snapshot['version']} with {len(trainees)} trainees")
+    return snapshot["version"]
+
+async def touch_roster_snapshot(fetched_at: datetime) -> None:
+    """Mark the persisted roster snapshot as confirmed current by ProHub"""
+    snapshots = database.database[Config.PROHUB_SNAPSHOT_COLLECTION]
+    await snapshots.update_one({"_id": "latest"}, {"$set": {"fetchedAt": fetched_at}})
+
+async def load_roster_snapshot() -> dict:
+    """Load the last persisted ProHub roster snapshot, if any"""
+    snapshots = database.database[Config.PROHUB_SNAPSHOT_COLLECTION]
+    return await snapshots.find_one({"_id": "latest"})
+
+async def load_roster_snapshot_meta() -> dict:
+    """Load the snapshot's version, fetchedAt and validators without the roster itself"""
+    snapshots = database.database[Config.PROHUB_SNAPSHOT_COLLECTION]
+    return await snapshots.find_one({"_id": "latest"}, {"trainees": 0})
+
+async def acquire_roster_lease(owner: str, ttl: int) -> bool:
+    """
+    Take or renew the roster refresh lease (one refresher across all workers)
+    
+    Args:
+        owner: Unique worker identifier
+        ttl: Lease lifetime in seconds; an expired lease can be taken over
+        
+    Returns:
+        True if this worker holds the lease
+    """
+    snapshots = database.database[Config.PROHUB_SNAPSHOT_COLLECTION]
+    now = datetime.utcnow()
+    try:
+        await snapshots.update_one(
+            {"_id": "refresh_lease", "$or": [{"owner": owner}, {"expiresAt": {"$lt": now}}]},
+            {"$set": {"owner": owner, "expiresAt": now + timedelta(seconds=ttl)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # Lease document exists and is held by a live worker
+        return False
+
+async def release_roster_lease(owner: str) -> None:
+    """Give up the roster refresh lease if this worker holds it"""
+    snapshots = database.database[Config.PROHUB_SNAPSHOT_COLLECTION]
+    await snapshots.delete_one({"_id": "refresh_lease", "owner": owner})
+
+# Fields the AI prompt reads from past work updates (LogBook names, then legacy names)
+WORK_HISTORY_FIELDS = ["task", "progress", "blockers", "date", "description", "challenges", "plans"]
+
+def _work_history_stages(intern_id: str, since: datetime, limit: int) -> list:
+    """Per-collection pipeline: indexed prefilter, effective timestamp, sort, limit"""
+    def to_date(field):
+        return {"$convert": {"input": field, "to": "date", "onError": None, "onNull": None}}
+    
+    return [
+        # Coarse filter served by the (internId, submittedAt) / (internId, date) indexes
+        {"$match": {
+            "internId": intern_id,
+            "$or": [
+                {"submittedAt": {"$gte": since}},
+                {"timestamp": {"$gte": since}},
+                {"date": {"$gte": since}},
+                {"date": {"$gte": since.strftime('%Y-%m-%d')}}
+            ]
+        }},
+        # Same precedence as before: submittedAt, then timestamp, then date
+        {"$addFields": {
+            "_historyTs": {"$ifNull": [
+                to_date("$submittedAt"),
+                {"$ifNull": [to_date("$timestamp"), to_date("$date")]}
+            ]}
+        }},
+        {"$match": {"_historyTs": {"$gt": since}}},
+        {"$sort": {"_historyTs": DESCENDING}},
+        {"$limit": limit}
+    ]
+
+async def get_recent_work_history(intern_id: str, days: int = 7, limit: int = 10,
+                                  include_temp_updates: bool = True) -> list:
+    """
+    Get an intern's most recent work updates from dailyrecords (and
+    temp_work_updates), filtered, sorted and trimmed by MongoDB
+    
+    Args:
+        intern_id: Intern ID
+        days: How far back to look
+        limit: Maximum number of updates returned
+        include_temp_updates: Also read unfinalized updates from temp_work_updates
+        
+    Returns:
+        Newest-first list of documents with the prompt fields, where
+        'submittedAt' holds the update's effective timestamp
+    """
+    since = datetime.now() - timedelta(days=days)
+    stages = _work_history_stages(intern_id, since, limit)
+    
+    pipeline = list(stages)
+    if include_temp_updates:
+        pipeline += [
+            {"$unionWith": {"coll": TEMP_WORK_UPDATES_COLLECTION, "pipeline": stages}},
+            {"$sort": {"_historyTs": DESCENDING}},
+            {"$limit": limit}
+        ]
+    pipeline += [
+        {"$project": {
+            "_id": 0,
+            "submittedAt": "$_historyTs",
+            **{field: 1 for field in WORK_HISTORY_FIELDS}
+        }}
+    ]
+    
+    work_updates = database.database[Config.WORK_UPDATES_COLLECTION]
+    return await work_updates.aggregate(pipeline).to_list(length=limit)
+
+# Placeholder plans that do not count as the intern's latest plans
+NO_PLANS_VALUES = ("", "No specific plans", "On Leave")
+
+def digest_entry(record: dict, submitted_at: datetime = None, field_limit: int = None) -> dict:
+    """
+    Condense a daily record into a history digest entry
+    
+    Args:
+        record: Daily record (date, task, progress, blockers, status)
+        submitted_at: When the record was finalized (defaults to now)
+        field_limit: Estimated token cap per text field
+    """
+    field_limit = field_limit or Config.PROMPT_FIELD_TOKEN_LIMIT
+    
+    submitted_at = submitted_at or datetime.now()
+    date_value = record.get("date") or submitted_at
+    if isinstance(date_value, datetime):
+        date_value = date_value.strftime('%Y-%m-%d')
+    
+    entry = {
+        "date": date_value,
+        "submittedAt": submitted_at,
+        "status": record.get("status")
+    }
+    for field, legacy_field in (("task", "description"), ("progress", "challenges"), ("blockers", "plans")):
+        value = record.get(field) or record.get(legacy_field) or ""
+        entry[field] = truncate_to_tokens(str(value).strip(), field_limit)
+    return entry
+
+async def record_history_digest_entry(intern_id: str, entry: dict) -> None:
+    """
+    Add or replace one day's entry in an intern's history digest (seeding
+    the digest from finalized daily records first if the intern has none), keeping
+    only the newest HISTORY_DIGEST_MAX_ENTRIES entries of the last
+    HISTORY_DIGEST_DAYS days, and advance latestPlans when the entry has plans
+    
+    Args:
+        intern_id: Intern ID
+        entry: Entry built by digest_entry()
+    """
+    digests = database.database[Config.HISTORY_DIGEST_COLLECTION]
+    intern_id = str(intern_id)
+    cutoff = (datetime.now() - timedelta(days=Config.HISTORY_DIGEST_DAYS)).strftime('%Y-%m-%d')
+    
+    # A new digest starts from the intern's finalized history, not just this entry
+    if await digests.count_documents({"_id": intern_id}, limit=1) == 0:
+        docs = await get_recent_work_history(
+            intern_id, days=Config.HISTORY_DIGEST_DAYS, limit=Config.HISTORY_DIGEST_MAX_ENTRIES,
+            include_temp_updates=False
+        )
+        await seed_history_digest(
+            intern_id, [digest_entry(doc, submitted_at=doc.get("submittedAt")) for doc in docs]
+        )
+    
+    # MongoDB cannot $pull and $push the same array in one update
+    await digests.update_one(
+        {"_id": intern_id},
+        {"$pull": {"entries": {"$or": [{"date": entry["date"]}, {"date": {"$lt": cutoff}}]}}}
+    )
+    await digests.update_one(
+        {"_id": intern_id},
+        {
+            "$push": {"entries": {
+                "$each": [entry],
+                "$sort": {"date": DESCENDING},
+                "$slice": Config.HISTORY_DIGEST_MAX_ENTRIES
+            }},
+            "$set": {"updatedAt": datetime.now()}
+        }
+    )
+    
+    if entry.get("blockers") not in NO_PLANS_VALUES:
+        await digests.update_one(
+            {"_id": intern_id, "$or": [
+                {"latestPlans.date": {"$lte": entry["date"]}},
+                {"latestPlans": {"$exists": False}}
+            ]},
+            {"$set": {"latestPlans": {"date": entry["date"], "plans": entry["blockers"]}}}
+        )
+
+async def seed_history_digest(intern_id: str, entries: list) -> None:
+    """Create an intern's digest from finalized daily records, unless one was created meanwhile"""
+    digests = database.database[Config.HISTORY_DIGEST_COLLECTION]
+    entries = sorted(entries, key=lambda entry: entry["date"] or "", reverse=True)[:Config.HISTORY_DIGEST_MAX_ENTRIES]
+    seed = {"entries": entries, "updatedAt": datetime.now()}
+    latest = next((entry for entry in entries if entry.get("blockers") not in NO_PLANS_VALUES), None)
+    if latest:
+        seed["latestPlans"] = {"date": latest["date"], "plans": latest["blockers"]}
+    await digests.update_one({"_id": str(intern_id)}, {"$setOnInsert": seed}, upsert=True)
+
+async def get_history_digest(intern_id: str) -> dict:
+    """Get an intern's history digest, if one exists"""
+    digests = database.database[Config.HISTORY_DIGEST_COLLECTION]
+    return await digests.find_one({"_id": str(intern_id)})
+
+async def get_cached_questions(prompt_hash: str) -> list:
+    """Get question sets previously generated for a prompt hash, if still cached"""
+    question_cache = database.database[Config.QUESTION_CACHE_COLLECTION]
+    doc = await question_cache.find_one({"_id": prompt_hash}, {"questions": 1})
+    return doc["questions"] if doc else None
+
+async def save_cached_questions(prompt_hash: str, questions: list) -> None:
+    """Cache generated question sets under their prompt hash (expired by the TTL index)"""
+    question_cache = database.database[Config.QUESTION_CACHE_COLLECTION]
+    await question_cache.replace_one(
+        {"_id": prompt_hash},
+        {"_id": prompt_hash, "questions": questions, "createdAt": datetime.utcnow()},
+        upsert=True
+    )
+
+# Question generation job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+async def enqueue_question_job(intern_id: str, temp_work_update_id: str, max_attempts: int) -> tuple:
+    """
+    Queue a question generation job, reusing an unfinished job for the same
+    temp work update (client retries don't queue duplicates). Concurrent
+    requests are deduplicated by the partial unique index on active jobs.
+    
+    Returns:
+        Tuple of (job document, True if a new job was created)
+    """
+    jobs = database.database[Config.QUESTION_JOBS_COLLECTION]
+    unfinished = {"tempWorkUpdateId": temp_work_update_id, "status": {"$in": [JOB_QUEUED, JOB_RUNNING]}}
+    existing = await jobs.find_one(unfinished)
+    if existing:
+        return existing, False
+    
+    now = datetime.utcnow()
+    job = {
+        "_id": uuid.uuid4().hex,
+        "internId": intern_id,
+        "tempWorkUpdateId": temp_work_update_id,
+        "status": JOB_QUEUED,
+        # Queued or running; covered by the unique index until the job finishes
+        "active": True,
+        "attempts": 0,
+        "maxAttempts": max_attempts,
+        "availableAt": now,
+        "leaseOwner": None,
+        "leaseExpiresAt": None,
+        "result": None,
+        "error": None,
+        "createdAt": now,
+        "updatedAt": now
+    }
+    try:
+        await jobs.insert_one(job)
+    except DuplicateKeyError:
+        # Another request queued a job for this update since the lookup
+        existing = await jobs.find_one(unfinished)
+        if existing:
+            return existing, False
+        # ...and it already finished: queue a fresh one
+        return await enqueue_question_job(intern_id, temp_work_update_id, max_attempts)
+    return job, True
+
+async def claim_question_job(owner: str, lease_seconds: int) -> dict:
+    """
+    Atomically claim the oldest runnable job: a queued job that is due, or a
+    running job whose worker's lease expired (worker crashed or restarted)
+    """
+    jobs = database.database[Config.QUESTION_JOBS_COLLECTION]
+    now = datetime.utcnow()
+    return await jobs.find_one_and_update(
+        {"$or": [
+            {"status": JOB_QUEUED, "availableAt": {"$lte": now}},
+            {"status": JOB_RUNNING, "leaseExpiresAt": {"$lt": now}}
+        ]},
+        {
+            "$set": {
+                "status": JOB_RUNNING,
+                "leaseOwner": owner,
+                "leaseExpiresAt": now + timedelta(seconds=lease_seconds),
+                "startedAt": now,
+                "updatedAt": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("availableAt", ASCENDING)],
+        return_document=ReturnDocument.AFTER
+    )
+
+async def finish_question_job(job_id: str, owner: str, result: dict = None, error: str = None,
+                              retry_at: datetime = None, retention_seconds: int = 86400) -> bool:
+    """
+    Record a job outcome (only if owner still holds its lease)
+    A retry_at puts the job back in the queue instead of finishing it
+    """
+    jobs = database.database[Config.QUESTION_JOBS_COLLECTION]
+    now = datetime.utcnow()
+    if retry_at is not None:
+        update = {"status": JOB_QUEUED, "availableAt": retry_at, "error": error}
+    else:
+        update = {
+            "status": JOB_FAILED if error else JOB_SUCCEEDED,
+            "active": False,
+            "result": result,
+            "error": error,
+            "completedAt": now,
+            "expiresAt": now + timedelta(seconds=retention_seconds)
+        }
+    update.update({"leaseOwner": None, "leaseExpiresAt": None, "updatedAt": now})
+    
+    outcome = await jobs.update_one(
+        {"_id": job_id, "status": JOB_RUNNING, "leaseOwner": owner},
+        {"$set": update}
+    )
+    return outcome.matched_count > 0
+
+async def get_question_job(job_id: str) -> dict:
+    """Get a question generation job by ID"""
+    jobs = database.database[Config.QUESTION_JOBS_COLLECTION]
+    return await jobs.find_one({"_id": job_id})
+
 def get_database():
     """Get database instance"""
     return database.database
@@ -469,6 +859,42 @@ async def create_temp_work_update(work_update_data: dict) -> str:
         logger.error(f"Failed to create temp work update: {e}")
         raise
 
+async def save_pregenerated_questions(temp_id: str, questions: list, input_hash: str,
+                                      alternates: list = None) -> bool:
+    """
+    Store questions (and alternate sets) generated ahead of the follow-up start on the temp work update
+    
+    Returns:
+        False if the temp work update is gone or was resubmitted with other inputs
+    """
+    temp_collection = get_temp_collection()
+    result = await temp_collection.update_one(
+        {"_id": ObjectId(temp_id), "aiInputHash": input_hash},
+        {"$set": {
+            "aiQuestions": questions,
+            "aiAlternateQuestions": alternates or [],
+            "aiQuestionsInputHash": input_hash,
+            "aiQuestionsGeneratedAt": datetime.now()
+        }}
+    )
+    return result.matched_count > 0
+
+async def pop_alternate_questions(session_id: str) -> dict:
+    """
+    Take the next stored alternate question set off a pending follow-up session
+    Atomic, so concurrent regenerate requests never get the same set.
+    
+    Returns:
+        The session as it was before the pop (its first alternateQuestions
+        entry is the taken set), or None if it has no alternates left
+    """
+    followup_sessions = database.database[Config.FOLLOWUP_SESSIONS_COLLECTION]
+    return await followup_sessions.find_one_and_update(
+        {"_id": session_id, "status": "pending", "alternateQuestions.0": {"$exists": True}},
+        {"$pop": {"alternateQuestions": -1}},
+        return_document=ReturnDocument.BEFORE
+    )
+
 async def get_temp_work_update(temp_id: str) -> dict:
     """Get temporary work update by ID"""
     try:
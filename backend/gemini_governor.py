@@ -0,0 +1,243 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lowest value served first
+LANE_INTERACTIVE = 0  # Intern waiting on a follow-up start
+LANE_BACKGROUND = 1   # Speculative pre-generation
+LANE_TEST = 2         # AI test endpoints and warm-up
+LANE_NAMES = {LANE_INTERACTIVE: "interactive", LANE_BACKGROUND: "background", LANE_TEST: "test"}
+
+
+class GeminiBusyError(Exception):
+    """Raised when a model call waited longer than the governor's queue limit"""
+    pass
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Check if a Gemini error means we are being rate limited"""
+    if google_exceptions is not None and isinstance(error, google_exceptions.ResourceExhausted):
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful Gemini calls, for percentile estimates"""
+
+    def __init__(self, size: int):
+        self._samples = deque(maxlen=max(1, size))
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Nearest-rank percentile of the window (None when empty)"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        rank = max(1, math.ceil(percent / 100 * len(ordered)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+
+class GeminiGovernor:
+    """
+    Admission control for every Gemini call in the process
+    A token bucket caps the request rate, max_in_flight caps concurrency,
+    waiters are served by priority lane (then arrival), queue waits are
+    bounded, and quota errors pause admissions with exponential backoff.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, max_in_flight: int,
+                 max_queue_wait: float, quota_backoff: float, quota_backoff_max: float):
+        self.rate = rate_per_minute / 60.0  # Tokens per second (0 = unlimited)
+        self.burst = max(1, burst)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue_wait = max_queue_wait
+        self.quota_backoff = quota_backoff
+        self.quota_backoff_max = quota_backoff_max
+
+        self.in_flight = 0
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._backoff_until = 0.0
+        self._consecutive_quota_errors = 0
+        self._waiters: List[tuple] = []  # Heap of (lane, sequence, future)
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self._lanes = {
+            lane: {"queued": 0, "max_queued": 0, "admitted": 0, "rejected": 0,
+                   "total_wait_seconds": 0.0, "max_wait_seconds": 0.0}
+            for lane in LANE_NAMES
+        }
+        self.quota_errors = 0
+
+    @asynccontextmanager
+    async def slot(self, lane: int = LANE_INTERACTIVE):
+        """Hold a Gemini call slot for the duration of the block"""
+        await self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, lane: int = LANE_INTERACTIVE) -> None:
+        """
+        Wait for permission to call Gemini
+
+        Raises:
+            GeminiBusyError: If no slot was granted within max_queue_wait seconds
+        """
+        stats = self._lanes[lane]
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (lane, next(self._sequence), future))
+        stats["queued"] += 1
+        stats["max_queued"] = max(stats["max_queued"], stats["queued"])
+        started = time.monotonic()
+        self._dispatch()
+
+        try:
+            await asyncio.wait_for(future, timeout=self.max_queue_wait)
+        except asyncio.TimeoutError:
+            stats["rejected"] += 1
+            raise GeminiBusyError(
+                f"Gemini busy: no {LANE_NAMES[lane]} slot within {self.max_queue_wait}s"
+            )
+        except asyncio.CancelledError:
+            # Granted just before the caller went away: hand the slot back
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            stats["queued"] -= 1
+
+        waited = time.monotonic() - started
+        stats["admitted"] += 1
+        stats["total_wait_seconds"] += waited
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+
+    def release(self) -> None:
+        """Give back a slot taken by acquire()"""
+        self.in_flight -= 1
+        self._dispatch()
+
+    def has_spare_capacity(self) -> bool:
+        """True if a call would be admitted right away (used to decide on hedging)"""
+        return (
+            self.in_flight < self.max_in_flight
+            and not self._waiters
+            and time.monotonic() >= self._backoff_until
+        )
+
+    def record_success(self) -> None:
+        self._consecutive_quota_errors = 0
+
+    def record_quota_error(self) -> float:
+        """
+        Pause admissions after Gemini reports a quota / rate limit error
+
+        Returns:
+            The backoff delay in seconds
+        """
+        self.quota_errors += 1
+        self._consecutive_quota_errors += 1
+        delay = min(self.quota_backoff * (2 ** (self._consecutive_quota_errors - 1)), self.quota_backoff_max)
+        self._backoff_until = max(self._backoff_until, time.monotonic() + delay)
+        logger.warning(f"⚠️ Gemini quota error, pausing model calls for {delay}s")
+        return delay
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _dispatch(self) -> None:
+        """Admit waiters in priority order while concurrency, tokens and backoff allow"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        self._refill(now)
+
+        while self._waiters:
+            future = self._waiters[0][2]
+            if future.done():
+                # Waiter timed out or was cancelled
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= self.max_in_flight:
+                return  # release() dispatches again
+            if now < self._backoff_until:
+                self._schedule(self._backoff_until - now)
+                return
+            if self.rate > 0 and self._tokens < 1:
+                self._schedule((1 - self._tokens) / self.rate)
+                return
+
+            heapq.heappop(self._waiters)
+            if self.rate > 0:
+                self._tokens -= 1
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _schedule(self, delay: float) -> None:
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth, wait times and admission counters per lane"""
+        now = time.monotonic()
+        self._refill(now)
+        lanes = {}
+        for lane, stats in self._lanes.items():
+            lanes[LANE_NAMES[lane]] = {
+                **stats,
+                "avg_wait_seconds": round(stats["total_wait_seconds"] / stats["admitted"], 4)
+                if stats["admitted"] else None
+            }
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": sum(stats["queued"] for stats in self._lanes.values()),
+            "tokens_available": round(self._tokens, 2) if self.rate > 0 else None,
+            "rate_per_minute": self.rate * 60,
+            "quota_errors": self.quota_errors,
+            "backoff_remaining_seconds": round(max(0.0, self._backoff_until - now), 2),
+            "lanes": lanes
+        }
+
+
+# Singleton instance shared by every Gemini call in the process
+_gemini_governor = None
+
+def get_gemini_governor() -> GeminiGovernor:
+    """Get singleton instance of the Gemini governor"""
+    global _gemini_governor
+    if _gemini_governor is None:
+        _gemini_governor = GeminiGovernor(
+            rate_per_minute=Config.GEMINI_RATE_PER_MINUTE,
+            burst=Config.GEMINI_BURST,
+            max_in_flight=Config.GEMINI_MAX_IN_FLIGHT,
+            max_queue_wait=Config.GEMINI_MAX_QUEUE_WAIT,
+            quota_backoff=Config.GEMINI_QUOTA_BACKOFF,
+            quota_backoff_max=Config.GEMINI_QUOTA_BACKOFF_MAX
+        )
+    return _gemini_governor
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple, List
+
+from config import Config
+from database import get_database, verify_ttl_index
+from integration import get_prohub_status
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """
+    Runs health probes (MongoDB ping, TTL index, ProHub status) on a
+    background schedule and caches the results, so health endpoints polled
+    by load balancers never touch MongoDB or ProHub themselves
+    """
+
+    def __init__(self, interval: float, probe_timeout: float, ready_max_age: float):
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.ready_max_age = ready_max_age
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._checked_at: Optional[datetime] = None
+        self._checked_monotonic: Optional[float] = None
+        self.checks_run = 0
+
+    async def run(self) -> None:
+        """Probe forever, every interval seconds (started from the FastAPI lifespan)"""
+        while True:
+            await self.run_checks()
+            await asyncio.sleep(self.interval)
+
+    async def run_checks(self) -> None:
+        """Run every probe once and replace the cached results"""
+        database_result, ttl_result = await asyncio.gather(
+            self._probe("database", self._ping_database),
+            self._probe("ttl_index", verify_ttl_index)
+        )
+
+        try:
+            prohub_result = get_prohub_status()
+        except Exception as e:
+            prohub_result = {"status": "unhealthy", "error": str(e), "trainees_count": 0}
+
+        self._results = {
+            "database": database_result,
+            "ttl_index": ttl_result,
+            "prohub": prohub_result
+        }
+        self._checked_at = datetime.now()
+        self._checked_monotonic = time.monotonic()
+        self.checks_run += 1
+
+    async def _probe(self, name: str, check) -> Dict[str, Any]:
+        """Run one probe with a timeout, recording its outcome and duration"""
+        started = time.monotonic()
+        try:
+            ok = bool(await asyncio.wait_for(check(), timeout=self.probe_timeout))
+            error = None
+        except asyncio.TimeoutError:
+            ok, error = False, f"timed out after {self.probe_timeout}s"
+        except Exception as e:
+            ok, error = False, str(e)
+
+        if error:
+            logger.warning(f"⚠️ Health probe '{name}' failed: {error}")
+        return {
+            "ok": ok,
+            "error": error,
+            "duration_seconds": round(time.monotonic() - started, 4)
+        }
+
+    @staticmethod
+    async def _ping_database() -> bool:
+        db = get_database()
+        if db is None:
+            raise RuntimeError("Database not connected")
+        await db.command("ping")
+        return True
+
+    def age_seconds(self) -> Optional[float]:
+        """Seconds since the last completed probe run"""
+        if self._checked_monotonic is None:
+            return None
+        return time.monotonic() - self._checked_monotonic
+
+    def database_ok(self) -> bool:
+        return self._results.get("database", {}).get("ok", False)
+
+    def ttl_index_active(self) -> bool:
+        return self._results.get("ttl_index", {}).get("ok", False)
+
+    def prohub_health(self) -> Dict[str, Any]:
+        """Cached ProHub status (same keys as check_prohub_api_health)"""
+        return self._results.get("prohub") or {"status": "unknown", "trainees_count": 0}
+
+    def readiness(self) -> Tuple[bool, List[str]]:
+        """
+        Decide whether this instance should receive traffic
+
+        Returns:
+            Tuple of (ready, list of reasons it is not ready)
+        """
+        reasons = []
+        age = self.age_seconds()
+        if age is None:
+            reasons.append("health checks have not run yet")
+        elif age > self.ready_max_age:
+            reasons.append(f"health results are stale ({age:.0f}s old)")
+        if not self.database_ok():
+            reasons.append("database unreachable")
+        if self.prohub_health().get("status") == "unhealthy":
+            reasons.append("ProHub roster not loaded")
+        return not reasons, reasons
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cached probe results with their age"""
+        age = self.age_seconds()
+        return {
+            "checks": dict(self._results),
+            "checked_at": self._checked_at.isoformat() if self._checked_at else None,
+            "check_age_seconds": round(age, 2) if age is not None else None,
+            "check_interval_seconds": self.interval,
+            "checks_run": self.checks_run
+        }
+
+
+# Singleton instance for reuse across the application
+_health_monitor = None
+
+def get_health_monitor() -> HealthMonitor:
+    """Get singleton instance of the health monitor"""
+    global _health_monitor
+    if _health_monitor is None:
+        _health_monitor = HealthMonitor(
+            interval=Config.HEALTH_CHECK_INTERVAL,
+            probe_timeout=Config.HEALTH_CHECK_TIMEOUT,
+            ready_max_age=Config.HEALTH_READY_MAX_AGE
+        )
+    return _health_monitor
@@ -1,122 +1,895 @@
+import asyncio
+import hashlib
 import httpx
 import logging
+import os
+import socket
+import time
+import uuid
 import pprint
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Set
 from datetime import datetime
 from config import Config  # Import Config
+from roster_store import RosterStore, create_roster_store
+from cache import TTLCache
+
+try:
+    import ijson  # Optional: streaming parse of the roster payload
+except ImportError:
+    ijson = None
 
 logging.basicConfig(level=logging.DEBUG)
 
 logger = logging.getLogger(__name__)
 
+# Field name variations used by the ProHub API
+ID_FIELDS = ['Trainee_ID', 'id', 'Id', 'ID', 'traineeId', 'TraineeId']
+EMAIL_FIELDS = ['Trainee_Email', 'email', 'Email', 'emailAddress', 'mail']
+NAME_FIELDS = ['Trainee_Name', 'name', 'Name', 'fullName', 'FullName', 'trainee_name']
+STATUS_FIELDS = ['status', 'Status', 'isActive', 'IsActive', 'active', 'Active']
+DEPARTMENT_FIELDS = ['department', 'Department']
+BATCH_FIELDS = ['batch', 'Batch']
+
+# ijson prefixes of trainee objects: {"dataBundle": [...]} or a bare list
+ROSTER_ITEM_PREFIXES = ('dataBundle.item', 'item')
+# Format tag of snapshots holding TraineeRecord.to_dict() rows
+SNAPSHOT_FORMAT = "trainee_records"
+ACTIVE_STATUS_VALUES = frozenset(['active', 'enrolled', 'true', '1', 'yes'])
+
+
+class TraineeRecord:
+    """
+    Compact normalized trainee record built once per roster refresh
+    Consumers read these attributes instead of probing field name variants
+    """
+    
+    __slots__ = ("intern_id", "email", "name", "department", "batch", "status", "active")
+    
+    def __init__(self, intern_id: str, email: str, name: str, department: Any = None,
+                 batch: Any = None, status: Any = None, active: bool = True):
+        self.intern_id = intern_id
+        self.email = email
+        self.name = name
+        self.department = department
+        self.batch = batch
+        self.status = status
+        self.active = active
+    
+    @property
+    def email_key(self) -> str:
+        """Normalized (case insensitive) email used for lookups"""
+        return self.email.lower()
+    
+    def _values(self) -> tuple:
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+    
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, TraineeRecord):
+            return NotImplemented
+        return self._values() == other._values()
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return (
+            f"TraineeRecord(intern_id={self.intern_id!r}, email={self.email!r}, "
+            f"name={self.name!r}, department={self.department!r}, active={self.active})"
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dictionary form (used for the persisted snapshot)"""
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TraineeRecord":
+        """Rebuild a record from to_dict() output"""
+        return cls(**{slot: data.get(slot) for slot in cls.__slots__ if slot in data})
+
+
+class RosterSchema:
+    """
+    Field names a ProHub payload uses, detected once from its first trainee
+    Records missing a detected field fall back to probing every variant
+    """
+    
+    __slots__ = ("id_field", "email_field", "name_field", "status_field",
+                 "department_field", "batch_field")
+    
+    def __init__(self, sample: Dict[str, Any]):
+        self.id_field = self._detect(sample, ID_FIELDS)
+        self.email_field = self._detect(sample, EMAIL_FIELDS)
+        self.name_field = self._detect(sample, NAME_FIELDS)
+        self.status_field = self._detect(sample, STATUS_FIELDS)
+        self.department_field = self._detect(sample, DEPARTMENT_FIELDS)
+        self.batch_field = self._detect(sample, BATCH_FIELDS)
+        logger.info(f"Detected ProHub roster schema: {self.fields()}")
+    
+    @staticmethod
+    def _detect(sample: Dict[str, Any], candidates: List[str]) -> Optional[str]:
+        for field in candidates:
+            if field in sample:
+                return field
+        return None
+    
+    @staticmethod
+    def _get(raw: Dict[str, Any], field: Optional[str], candidates: List[str]) -> tuple:
+        """Get (field found, value), trying the detected field before probing"""
+        if field is not None and field in raw:
+            return True, raw[field]
+        for candidate in candidates:
+            if candidate in raw:
+                return True, raw[candidate]
+        return False, None
+    
+    def fields(self) -> Dict[str, Optional[str]]:
+        """Detected field name per attribute"""
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+    
+    def normalize(self, raw: Dict[str, Any]) -> TraineeRecord:
+        """Convert one raw ProHub trainee dictionary into a TraineeRecord"""
+        found, intern_id = self._get(raw, self.id_field, ID_FIELDS)
+        intern_id = str(intern_id) if found and intern_id is not None else ''
+        
+        _, email = self._get(raw, self.email_field, EMAIL_FIELDS)
+        _, name = self._get(raw, self.name_field, NAME_FIELDS)
+        _, department = self._get(raw, self.department_field, DEPARTMENT_FIELDS)
+        _, batch = self._get(raw, self.batch_field, BATCH_FIELDS)
+        _, status = self._get(raw, self.status_field, STATUS_FIELDS)
+        
+        return TraineeRecord(
+            intern_id=intern_id,
+            email=str(email or '').strip(),
+            name=str(name or '').strip(),
+            department=department,
+            batch=batch,
+            status=status,
+            active=self._is_active(raw, status)
+        )
+    
+    def _is_active(self, raw: Dict[str, Any], status: Any) -> bool:
+        if isinstance(status, bool):
+            return status
+        if isinstance(status, str):
+            return status.lower() in ACTIVE_STATUS_VALUES
+        # Detected field missing or not a flag: probe the remaining variants
+        for field in STATUS_FIELDS:
+            value = raw.get(field)
+            if isinstance(value, bool):
+                return value
+            elif isinstance(value, str):
+                return value.lower() in ACTIVE_STATUS_VALUES
+        return True  # Default to active if no status field
+
+
+class _AsyncByteReader:
+    """Async file-like adapter over an httpx byte stream, hashing what it reads"""
+    
+    def __init__(self, chunks, hasher):
+        self._chunks = chunks
+        self._hasher = hasher
+    
+    async def read(self, size: int = -1) -> bytes:
+        # ijson probes the stream type with read(0) and discards the result
+        if size == 0:
+            return b""
+        # ijson treats b"" as end of stream, so skip empty chunks
+        async for chunk in self._chunks:
+            if chunk:
+                self._hasher.update(chunk)
+                return chunk
+        return b""
+
+
 class ProHubIntegration:
     """
     Integration service for ProHub API to fetch trainee information
     Handles authentication and caching for better performance
     """
     
-    def __init__(self):
+    def __init__(self, store: Optional[RosterStore] = None):
         self.prohub_api_url = Config.PROHUB_API_URL  # Use Config
         self.timeout = Config.PROHUB_API_TIMEOUT  # Use Config
         self.cache_duration = Config.PROHUB_CACHE_DURATION  # Use Config
+        self.stale_while_revalidate = Config.PROHUB_STALE_WHILE_REVALIDATE
+        self.refresh_interval = Config.PROHUB_REFRESH_INTERVAL
+        self.max_stale_age = Config.PROHUB_MAX_STALE_AGE
+        self.streaming_parse = Config.PROHUB_STREAMING_PARSE
+        if self.streaming_parse and ijson is None:
+            logger.warning("ijson not installed, parsing ProHub roster without streaming")
         self._trainees_cache = None
         self._cache_timestamp = None
+        self._cache_source = None  # "prohub" or "snapshot"
+        # Hash indexes rebuilt once per cache refresh (normalized email / id -> trainee)
+        self._email_index: Dict[str, TraineeRecord] = {}
+        self._id_index: Dict[str, TraineeRecord] = {}
+        # Field names detected on the last parsed roster
+        self._roster_schema: Optional[RosterSchema] = None
+        # Admin summary, recomputed only when the roster changes
+        self._roster_summary: Optional[Dict[str, Any]] = None
+        # Roster store shared by workers; the lease holder is the only one calling ProHub
+        self.store = store or create_roster_store()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_ttl = Config.PROHUB_REFRESH_LEASE_TTL
+        self.store_poll_interval = Config.PROHUB_STORE_POLL_INTERVAL
+        self._is_refresher = False
+        self._store_version: Optional[int] = None
+        # Long-lived pooled HTTP client and the HTTP method ProHub accepts
+        self._client: Optional[httpx.AsyncClient] = None
+        self._http_method = "POST"
+        # Validators for conditional fetches and change detection
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._content_hash: Optional[str] = None
+        # Single-flight refresh: one roster download per process at a time
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_stats = {
+            "refreshes_started": 0,
+            "refreshes_failed": 0,
+            "coalesced_callers": 0,
+            "stale_served": 0,
+            "short_circuited": 0,
+            "not_modified": 0,
+            "unchanged": 0,
+            "store_syncs": 0
+        }
+        # Fail fast while ProHub is down instead of waiting for the timeout
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=Config.PROHUB_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Config.PROHUB_BREAKER_RESET_TIMEOUT
+        )
+        # Called after every roster change with the changed emails (None = everything)
+        self._refresh_listeners: List[Callable[[Optional[Set[str]]], None]] = []
+        # Emails recently found to be unknown or inactive
+        self._negative_cache = TTLCache(
+            maxsize=Config.PROHUB_NEGATIVE_CACHE_SIZE,
+            ttl=Config.PROHUB_NEGATIVE_CACHE_TTL
+        )
         
-    async def fetch_all_trainees(self, force_refresh: bool = False) -> List[Dict[str, Any]]:
+    async def fetch_all_trainees(self, force_refresh: bool = False) -> List[TraineeRecord]:
         """
         Fetch all active trainees from ProHub API with caching
         
+        Concurrent callers that find the cache expired share a single
+        in-flight refresh instead of each downloading the roster. In
+        stale-while-revalidate mode an expired roster that is still within
+        the hard expiry limit is returned immediately and refreshed in the
+        background.
+        
         Args:
             force_refresh: Force refresh cache even if not expired
             
         Returns:
-            List of trainee dictionaries
+            List of normalized trainee records
         """
-        try:
-            # Check cache first
-            if not force_refresh and self._is_cache_valid():
-                logger.info("Using cached trainees data")
+        # Check cache first
+        if not force_refresh and self._is_cache_valid():
+            logger.info("Using cached trainees data")
+            return self._trainees_cache
+        
+        # Serve stale data while revalidating, unless past hard expiry
+        if not force_refresh and self.stale_while_revalidate and self._is_within_max_stale_age():
+            if self._refresh_task is None or self._refresh_task.done():
+                logger.info("Serving stale trainees data, refreshing in background")
+                self._start_refresh()
+            self._refresh_stats["stale_served"] += 1
+            return self._trainees_cache
+        
+        # Join the refresh that is already running, if any
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_stats["coalesced_callers"] += 1
+            logger.info("Waiting for in-flight ProHub roster refresh")
+        elif self._start_refresh() is None:
+            # Circuit open: fail fast, serving cached data while it is within the hard expiry
+            self._refresh_stats["short_circuited"] += 1
+            if not force_refresh and self._is_within_max_stale_age():
+                logger.warning("ProHub circuit breaker open, serving cached trainees data")
                 return self._trainees_cache
+            raise ProHubIntegrationError("ProHub API unavailable (circuit breaker open)")
+        
+        # Shield so a cancelled caller does not cancel the shared refresh
+        return await asyncio.shield(self._refresh_task)
+    
+    def _start_refresh(self) -> Optional[asyncio.Task]:
+        """
+        Start a roster refresh task (caller must check none is in flight)
+        
+        Returns:
+            The refresh task, or None if the circuit breaker is open
+        """
+        if not self.circuit_breaker.allow_request():
+            return None
+        
+        self._refresh_stats["refreshes_started"] += 1
+        self._refresh_task = asyncio.create_task(self._refresh_or_sync())
+        self._refresh_task.add_done_callback(self._on_refresh_done)
+        return self._refresh_task
+    
+    @staticmethod
+    def _on_refresh_done(task: asyncio.Task) -> None:
+        """Retrieve refresh errors so background refreshes don't log 'never retrieved'"""
+        if not task.cancelled():
+            task.exception()
+    
+    async def run_background_refresh(self) -> None:
+        """
+        Reconcile the roster with ProHub right away (startup serves the
+        persisted snapshot meanwhile), then in stale-while-revalidate mode
+        keep it warm by refreshing every refresh_interval seconds.
+        Workers that don't hold the refresh lease poll the shared store
+        every store_poll_interval seconds instead.
+        Started from the FastAPI lifespan so user requests don't wait on ProHub.
+        """
+        while True:
+            try:
+                trainees = await self.fetch_all_trainees(force_refresh=True)
+                logger.info(f"✅ ProHub roster refreshed in background - {len(trainees)} trainees")
+            except ProHubIntegrationError as e:
+                logger.warning(f"⚠️ Background ProHub roster refresh failed, keeping cached data: {e}")
+            except Exception as e:
+                logger.error(f"Unexpected error in background ProHub refresh: {e}")
             
+            if not self.stale_while_revalidate:
+                return
+            await asyncio.sleep(self.refresh_interval if self._is_refresher else self.store_poll_interval)
+    
+    async def load_snapshot(self) -> bool:
+        """
+        Seed the cache from the persisted roster snapshot for an instant warm start
+        
+        Returns:
+            True if a snapshot was loaded, False otherwise
+        """
+        try:
+            snapshot = await self.store.load()
+        except Exception as e:
+            logger.warning(f"Could not load ProHub roster snapshot: {e}")
+            return False
+        
+        if not snapshot or not snapshot.get("trainees"):
+            logger.info("No ProHub roster snapshot found")
+            return False
+        
+        # Never replace data that is newer than the snapshot
+        fetched_at = snapshot.get("fetchedAt")
+        if self._cache_timestamp and fetched_at and fetched_at <= self._cache_timestamp:
+            return False
+        
+        self._install_snapshot(snapshot, source="snapshot")
+        logger.info(
+            f"Loaded ProHub roster snapshot: {len(self._trainees_cache)} trainees, "
+            f"{self._cache_age_seconds():.0f}s old"
+        )
+        return True
+    
+    async def sync_from_store(self) -> bool:
+        """
+        Pick up the roster version published by the refresh lease holder
+        Only the snapshot metadata is read unless the version changed.
+        
+        Returns:
+            True if a new roster version was installed, False otherwise
+        """
+        meta = await self.store.load_meta()
+        if not meta:
+            return False
+        
+        if meta.get("version") == self._store_version:
+            # Same roster; the refresher may have re-confirmed it with ProHub
+            fetched_at = meta.get("fetchedAt")
+            if fetched_at and (self._cache_timestamp is None or fetched_at > self._cache_timestamp):
+                self._cache_timestamp = fetched_at
+            return False
+        
+        snapshot = await self.store.load()
+        if not snapshot or not snapshot.get("trainees"):
+            return False
+        
+        self._install_snapshot(snapshot, source="shared")
+        self._refresh_stats["store_syncs"] += 1
+        logger.info(f"Loaded shared ProHub roster v{self._store_version}: {len(self._trainees_cache)} trainees")
+        return True
+    
+    def _install_snapshot(self, snapshot: Dict[str, Any], source: str) -> None:
+        """Diff a stored roster into the cache and adopt its validators"""
+        if snapshot.get("format") == SNAPSHOT_FORMAT:
+            trainees = [TraineeRecord.from_dict(t) for t in snapshot["trainees"]]
+        else:
+            # Snapshot written before records were normalized: raw ProHub dicts
+            trainees = self._normalize_roster(snapshot["trainees"])
+        
+        changed_emails, _ = self._apply_roster_changes(trainees)
+        self._rebuild_summary()
+        self._cache_timestamp = snapshot.get("fetchedAt") or datetime.now()
+        self._cache_source = source
+        self._store_version = snapshot.get("version")
+        validators = snapshot.get("validators") or {}
+        self._etag = validators.get("etag")
+        self._last_modified = validators.get("lastModified")
+        self._content_hash = validators.get("contentHash")
+        self._invalidate_changed(changed_emails)
+    
+    def _invalidate_changed(self, changed_emails: Optional[Set[str]]) -> None:
+        """Drop negative-cache entries and notify listeners about changed trainees"""
+        # Only changed identities need their cached auth results dropped
+        if changed_emails is None:
+            self._negative_cache.clear()
+            self._notify_refresh_listeners(None)
+        elif changed_emails:
+            for email in changed_emails:
+                self._negative_cache.pop(email)
+            self._notify_refresh_listeners(changed_emails)
+    
+    async def _save_snapshot(self, roster_changed: bool = True) -> None:
+        """
+        Publish the current roster to the store (failures only log, the cache stays valid)
+        An unchanged roster only has its snapshot timestamp bumped
+        """
+        try:
+            if roster_changed:
+                self._store_version = await self.store.publish(
+                    [trainee.to_dict() for trainee in self._trainees_cache],
+                    self._cache_timestamp,
+                    validators={
+                        "etag": self._etag,
+                        "lastModified": self._last_modified,
+                        "contentHash": self._content_hash
+                    },
+                    record_format=SNAPSHOT_FORMAT
+                )
+            else:
+                await self.store.touch(self._cache_timestamp)
+        except Exception as e:
+            logger.warning(f"Could not save ProHub roster snapshot: {e}")
+    
+    async def _refresh_or_sync(self) -> List[TraineeRecord]:
+        """
+        Refresh from ProHub if this worker holds (or can take) the refresh
+        lease; otherwise load the lease holder's latest roster from the store.
+        A shared roster past the hard expiry (max_stale_age) is never served:
+        the worker then fetches from ProHub itself, failing like the lease
+        holder would when ProHub is down.
+        """
+        try:
+            self._is_refresher = await self.store.acquire_refresh_lease(self.worker_id, self.lease_ttl)
+        except Exception as e:
+            # Store unreachable: refresh locally rather than serve nothing
+            logger.warning(f"Could not acquire ProHub refresh lease, refreshing locally: {e}")
+            self._is_refresher = True
+        
+        if self._is_refresher:
+            return await self._refresh_trainees()
+        
+        try:
+            await self.sync_from_store()
+        except Exception as e:
+            logger.warning(f"Could not sync ProHub roster from shared store: {e}")
+        
+        if self._trainees_cache is None:
+            # Nothing published yet, don't leave this worker without a roster
+            logger.info("No shared ProHub roster available yet, fetching directly")
+            return await self._refresh_trainees()
+        if not self._is_within_max_stale_age():
+            # The lease holder has not published a fresh roster in time
+            logger.warning("Shared ProHub roster is past its hard expiry, fetching directly")
+            return await self._refresh_trainees()
+        return self._trainees_cache
+    
+    async def _refresh_trainees(self) -> List[TraineeRecord]:
+        """
+        Download the roster from ProHub API and merge it into the cache
+        
+        Unchanged payloads (304 Not Modified, or an identical content hash
+        when the server has no validators) leave the cache untouched. Otherwise
+        the new roster is diffed against the cache so that only added,
+        removed or changed trainees update the indexes and auth caches.
+        """
+        try:
             logger.info("Fetching trainees from ProHub API...")
+            started_at = datetime.now()
+            
+            streaming = self.streaming_parse and ijson is not None
+            response = await self._request_roster(stream=streaming)
+            try:
+                changed_emails, changes = await self._process_roster_response(response, streaming)
+            finally:
+                await response.aclose()
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # 🔥 FIX: Change from GET to POST request
-                # The ProHub API expects POST, not GET
-                # headers = {
-                #     'Content-Type': 'application/json',
-                #     'Accept': 'application/json'
-                # }
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json'
-                }
-                payload = {
-                    "secretKey": Config.PROHUB_API_KEY
-                }
-                # Try POST request first (most likely correct)
-                try:
-                    response = await client.post(
-                        self.prohub_api_url,
-                        headers=headers,
-                        json=payload
-                    )
-                    response.raise_for_status()
-                except httpx.HTTPStatusError as e:
-                    if e.response.status_code == 405:
-                        # If POST still fails with 405, try GET with proper headers
-                        logger.info("POST failed with 405, trying GET with headers...")
-                        response = await client.get(
-                            self.prohub_api_url,
-                            headers=headers
-                        )
-                        response.raise_for_status()
-                    else:
-                        raise
-                trainees_data = response.json()
-                # Handle different response structures
-                if isinstance(trainees_data, dict):
-                    # Extract trainees from 'dataBundle' key
-                    if 'dataBundle' in trainees_data:
-                        trainees_data = trainees_data['dataBundle']
-                    else:
-                        trainees_data = []
-
-                # Ensure we have a list
-                if not isinstance(trainees_data, list):
-                    trainees_data = []
-
-                # Cache the data
-                self._trainees_cache = trainees_data
-                self._cache_timestamp = datetime.now()
-
-                logger.info(f"Successfully fetched {len(trainees_data)} trainees from ProHub API")
-                if trainees_data:
-                    logger.info(f"Sample trainee: {trainees_data[0]}")
-                    # For test purposes: pretty-print all intern data
-                    # logger.info("--- All intern data (test purpose) ---")
-                    # logger.info(pprint.pformat(trainees_data))
-                return trainees_data
+            self._cache_timestamp = datetime.now()
+            self._refresh_stats["last_refresh_duration_seconds"] = (
+                datetime.now() - started_at
+            ).total_seconds()
+            self._cache_source = "prohub"
+            self.circuit_breaker.record_success()
+            
+            self._invalidate_changed(changed_emails)
+            await self._save_snapshot(roster_changed=changes is not None)
+
+            trainees_data = self._trainees_cache
+            logger.info(f"Successfully fetched {len(trainees_data)} trainees from ProHub API")
+            if trainees_data and changes is not None:
+                logger.info(f"Sample trainee: {trainees_data[0]}")
+                # For test purposes: pretty-print all intern data
+                # logger.info("--- All intern data (test purpose) ---")
+                # logger.info(pprint.pformat(trainees_data))
+            return trainees_data
                 
         except httpx.TimeoutException:
+            self._record_refresh_failure()
             logger.error("ProHub API request timed out")
             raise ProHubIntegrationError("ProHub API request timed out")
         except httpx.HTTPStatusError as e:
+            self._record_refresh_failure()
             logger.error(f"ProHub API returned error: {e.response.status_code} - {e.response.text}")
             raise ProHubIntegrationError(f"ProHub API error: {e.response.status_code}")
         except Exception as e:
+            self._record_refresh_failure()
             logger.error(f"Failed to fetch trainees from ProHub API: {e}")
             raise ProHubIntegrationError(f"Failed to fetch trainees: {str(e)}")
     
+    async def _process_roster_response(self, response: httpx.Response, streaming: bool) -> tuple:
+        """
+        Detect whether the roster changed and install it if so
+        
+        Returns:
+            Tuple of (changed emails as returned by _apply_roster_changes,
+            change counts or None when the roster is unchanged)
+        """
+        if response.status_code == 304:
+            self._refresh_stats["not_modified"] += 1
+            logger.info("ProHub roster not modified (304), keeping cached data")
+            return set(), None
+        
+        # Validators are only adopted once the body is known to match the cache,
+        # otherwise a failed parse would make later 304s pin the old roster
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        
+        if streaming:
+            # Hash is computed while parsing, so an unchanged body is parsed then dropped
+            trainees_data, content_hash = await self._stream_parse_roster(response)
+        else:
+            content_hash = hashlib.sha256(response.content).hexdigest()
+            trainees_data = None
+        
+        if self._trainees_cache is not None and content_hash == self._content_hash:
+            self._refresh_stats["unchanged"] += 1
+            logger.info("ProHub roster content unchanged, keeping cached data")
+            self._etag, self._last_modified = etag, last_modified
+            return set(), None
+        
+        if trainees_data is None:
+            trainees_data = self._normalize_roster(self._parse_roster_payload(response.json()))
+        
+        changed_emails, changes = self._apply_roster_changes(trainees_data)
+        self._rebuild_summary()
+        self._content_hash = content_hash
+        self._etag, self._last_modified = etag, last_modified
+        self._refresh_stats["last_changes"] = changes
+        logger.info(
+            f"ProHub roster changes: {changes['added']} added, "
+            f"{changes['removed']} removed, {changes['changed']} changed"
+        )
+        return changed_emails, changes
+    
+    def add_refresh_listener(self, callback: Callable[[Optional[Set[str]]], None]) -> None:
+        """
+        Register a callback invoked whenever the cached roster changes
+        
+        Args:
+            callback: Called with the set of changed (normalized) emails,
+                or None when the whole roster should be treated as changed
+        """
+        self._refresh_listeners.append(callback)
+    
+    def _notify_refresh_listeners(self, changed_emails: Optional[Set[str]]) -> None:
+        """Notify refresh listeners, logging (not raising) their errors"""
+        for callback in self._refresh_listeners:
+            try:
+                callback(changed_emails)
+            except Exception as e:
+                logger.error(f"Roster refresh listener failed: {e}")
+    
+    def _record_refresh_failure(self) -> None:
+        """Count a failed refresh and feed it to the circuit breaker"""
+        self._refresh_stats["refreshes_failed"] += 1
+        self.circuit_breaker.record_failure()
+    
+    def is_negatively_cached(self, email: str) -> bool:
+        """Check if an email was recently found unknown or inactive"""
+        return self._negative_cache.get(email.lower().strip()) is not None
+    
+    def remember_unauthorized(self, email: str, reason: str) -> None:
+        """Remember an unknown or inactive email for a short TTL"""
+        self._negative_cache.set(email.lower().strip(), reason)
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get the long-lived pooled HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(
+                max_connections=Config.PROHUB_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.PROHUB_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=Config.PROHUB_KEEPALIVE_EXPIRY
+            )
+            try:
+                self._client = httpx.AsyncClient(
+                    timeout=self.timeout,
+                    limits=limits,
+                    http2=Config.PROHUB_HTTP2
+                )
+            except ImportError:
+                # http2=True needs the optional 'h2' package (httpx[http2])
+                logger.warning("HTTP/2 support not installed, using HTTP/1.1 for ProHub API")
+                self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+        return self._client
+    
+    async def close(self) -> None:
+        """Close the pooled HTTP client and hand the refresh lease to another worker"""
+        if self._is_refresher:
+            try:
+                await self.store.release_refresh_lease(self.worker_id)
+            except Exception as e:
+                logger.warning(f"Could not release ProHub refresh lease: {e}")
+            self._is_refresher = False
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            logger.info("ProHub HTTP client closed")
+        self._client = None
+    
+    async def _request_roster(self, stream: bool = False) -> httpx.Response:
+        """
+        Request the roster over the pooled client.
+        The HTTP method ProHub accepts is remembered, so the POST -> GET
+        probe on a 405 only happens once per process.
+        
+        Args:
+            stream: Leave the response body unread so it can be parsed
+                incrementally (the caller must close the response)
+        """
+        client = self._get_client()
+        # The ProHub API expects POST, not GET
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json'
+        }
+        payload = {
+            "secretKey": Config.PROHUB_API_KEY
+        }
+        # Conditional fetch: ProHub may answer 304 when the roster is unchanged
+        if self._trainees_cache is not None:
+            if self._etag:
+                headers['If-None-Match'] = self._etag
+            if self._last_modified:
+                headers['If-Modified-Since'] = self._last_modified
+        
+        method = self._http_method
+        try:
+            response = await self._send_roster_request(client, method, headers, payload, stream)
+            self._raise_for_roster_status(response)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code != 405:
+                raise
+            # Method not allowed, try the other method and remember it if it works
+            fallback_method = "GET" if method == "POST" else "POST"
+            logger.info(f"{method} failed with 405, trying {fallback_method} with headers...")
+            response = await self._send_roster_request(client, fallback_method, headers, payload, stream)
+            self._raise_for_roster_status(response)
+            self._http_method = fallback_method
+        
+        return response
+    
+    @staticmethod
+    def _raise_for_roster_status(response: httpx.Response) -> None:
+        """Raise for error statuses; 304 Not Modified is a valid conditional-fetch answer"""
+        if response.status_code != 304:
+            response.raise_for_status()
+    
+    async def _send_roster_request(self, client: httpx.AsyncClient, method: str,
+                                   headers: Dict[str, str], payload: Dict[str, Any],
+                                   stream: bool = False) -> httpx.Response:
+        """
+        Send a single roster request with the given HTTP method
+        Error bodies are always read (and streams closed) so they can be logged
+        """
+        request = client.build_request(
+            method,
+            self.prohub_api_url,
+            headers=headers,
+            json=payload if method == "POST" else None
+        )
+        response = await client.send(request, stream=stream)
+        if stream and response.is_error:
+            await response.aread()
+            await response.aclose()
+        return response
+    
+    async def _stream_parse_roster(self, response: httpx.Response) -> tuple:
+        """
+        Parse trainees out of a streamed ProHub response without holding the
+        whole body or the full raw records in memory
+        
+        Returns:
+            Tuple of (trainee records, SHA-256 of the raw body)
+        """
+        hasher = hashlib.sha256()
+        reader = _AsyncByteReader(response.aiter_bytes(), hasher)
+        trainees: List[TraineeRecord] = []
+        schema = None
+        builder = None
+        item_prefix = None
+        
+        async for prefix, event, value in ijson.parse_async(reader, use_float=True):
+            if builder is not None:
+                if prefix == item_prefix and event == 'end_map':
+                    if schema is None:
+                        schema = self._roster_schema = RosterSchema(builder.value)
+                    trainees.append(schema.normalize(builder.value))
+                    builder = None
+                else:
+                    builder.event(event, value)
+            elif event == 'start_map' and prefix in ROSTER_ITEM_PREFIXES:
+                # Start of one trainee object in 'dataBundle' (or a bare list)
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                item_prefix = prefix
+        
+        return trainees, hasher.hexdigest()
+    
+    def get_refresh_stats(self) -> Dict[str, Any]:
+        """Get single-flight refresh metrics"""
+        stats = dict(self._refresh_stats)
+        stats["refresh_in_flight"] = self._refresh_task is not None and not self._refresh_task.done()
+        stats["http_method"] = self._http_method
+        stats["roster_schema"] = self._roster_schema.fields() if self._roster_schema else None
+        stats["store_backend"] = self.store.backend
+        stats["store_version"] = self._store_version
+        stats["refresh_role"] = "refresher" if self._is_refresher else "follower"
+        stats["worker_id"] = self.worker_id
+        return stats
+    
     def _is_cache_valid(self) -> bool:
         """Check if cached data is still valid"""
         if not self._trainees_cache or not self._cache_timestamp:
             return False
         
-        age = (datetime.now() - self._cache_timestamp).total_seconds()
-        return age < self.cache_duration
+        return self._cache_age_seconds() < self.cache_duration
+    
+    def _is_within_max_stale_age(self) -> bool:
+        """Check if cached data may still be served while a refresh runs"""
+        if not self._trainees_cache or not self._cache_timestamp:
+            return False
+        
+        return self._cache_age_seconds() < self.max_stale_age
+    
+    def _cache_age_seconds(self) -> Optional[float]:
+        """Age of the cached roster in seconds"""
+        if not self._cache_timestamp:
+            return None
+        
+        return (datetime.now() - self._cache_timestamp).total_seconds()
+    
+    @staticmethod
+    def _parse_roster_payload(trainees_data: Any) -> List[Dict[str, Any]]:
+        """Extract the trainee list from a ProHub response body"""
+        # Handle different response structures
+        if isinstance(trainees_data, dict):
+            # Extract trainees from 'dataBundle' key
+            if 'dataBundle' in trainees_data:
+                trainees_data = trainees_data['dataBundle']
+            else:
+                trainees_data = []
+
+        # Ensure we have a list
+        if not isinstance(trainees_data, list):
+            trainees_data = []
+        return trainees_data
+    
+    def _normalize_roster(self, raw_trainees: List[Any]) -> List[TraineeRecord]:
+        """Detect the payload's field names once, then normalize every trainee"""
+        raw_trainees = [trainee for trainee in raw_trainees if isinstance(trainee, dict)]
+        if not raw_trainees:
+            return []
+        
+        schema = self._roster_schema = RosterSchema(raw_trainees[0])
+        return [schema.normalize(trainee) for trainee in raw_trainees]
+    
+    @staticmethod
+    def _trainee_key(trainee: TraineeRecord) -> tuple:
+        """Stable identity of a trainee across roster downloads"""
+        if trainee.intern_id:
+            return ("id", trainee.intern_id)
+        if trainee.email:
+            return ("email", trainee.email_key)
+        return ("raw", trainee._values())
+    
+    def _build_indexes(self, trainees: List[TraineeRecord]) -> None:
+        """
+        Build email -> trainee and id -> trainee hash indexes for O(1) lookups.
+        The first trainee wins when several records share an email or ID,
+        matching the previous linear scan.
+        """
+        self._email_index = {}
+        self._id_index = {}
+        for trainee in trainees:
+            if trainee.email:
+                self._email_index.setdefault(trainee.email_key, trainee)
+            if trainee.intern_id:
+                self._id_index.setdefault(trainee.intern_id, trainee)
+        logger.info(f"Built trainee indexes: {len(self._email_index)} emails, {len(self._id_index)} IDs")
+    
+    def _update_indexes(self, removed: List[TraineeRecord], added: List[TraineeRecord],
+                        roster: List[TraineeRecord]) -> None:
+        """
+        Re-point the index entries of every email and ID touched by removed or
+        added trainees at the first record in roster that still has it, so a
+        duplicate left behind by a removal stays findable (first trainee wins)
+        """
+        emails = {trainee.email_key for trainee in removed + added if trainee.email}
+        ids = {trainee.intern_id for trainee in removed + added if trainee.intern_id}
+        for email in emails:
+            self._email_index.pop(email, None)
+        for intern_id in ids:
+            self._id_index.pop(intern_id, None)
+        
+        for trainee in roster:
+            if trainee.email and trainee.email_key in emails:
+                self._email_index.setdefault(trainee.email_key, trainee)
+            if trainee.intern_id and trainee.intern_id in ids:
+                self._id_index.setdefault(trainee.intern_id, trainee)
+    
+    def _apply_roster_changes(self, trainees: List[TraineeRecord]) -> tuple:
+        """
+        Diff a freshly downloaded roster against the cache and install it
+        
+        Unchanged trainees keep their existing record objects (and therefore
+        their index entries); only added, removed or changed trainees touch
+        the indexes.
+        
+        Returns:
+            Tuple of (changed normalized emails, or None when there was no
+            previous roster, and a dict of added/removed/changed counts)
+        """
+        if self._trainees_cache is None:
+            self._trainees_cache = trainees
+            self._build_indexes(trainees)
+            return None, {"added": len(trainees), "removed": 0, "changed": 0}
+        
+        # Records sharing a key are paired with the new roster in order
+        old_by_key: Dict[tuple, List[TraineeRecord]] = {}
+        for trainee in self._trainees_cache:
+            old_by_key.setdefault(self._trainee_key(trainee), []).append(trainee)
+        
+        merged, added, removed = [], [], []
+        changes = {"added": 0, "removed": 0, "changed": 0}
+        
+        for trainee in trainees:
+            old_records = old_by_key.get(self._trainee_key(trainee))
+            old = old_records.pop(0) if old_records else None
+            if old is None:
+                changes["added"] += 1
+                added.append(trainee)
+            elif old == trainee:
+                # Keep the existing parsed record
+                merged.append(old)
+                continue
+            else:
+                changes["changed"] += 1
+                removed.append(old)
+                added.append(trainee)
+            merged.append(trainee)
+        
+        for old_records in old_by_key.values():
+            for old in old_records:
+                changes["removed"] += 1
+                removed.append(old)
+        
+        self._trainees_cache = merged
+        if added or removed:
+            self._update_indexes(removed, added, merged)
+        
+        changed_emails = {trainee.email_key for trainee in removed + added if trainee.email}
+        return changed_emails, changes
     
-    async def find_trainee_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+    async def find_trainee_by_email(self, email: str) -> Optional[TraineeRecord]:
         """
         Find trainee by email address
         
@@ -124,36 +897,34 @@ class ProHubIntegration:
             email: Email address to search for
             
         Returns:
-            Trainee dictionary if found, None otherwise
+            Trainee record if found, None otherwise
+            
+        Raises:
+            ProHubIntegrationError: If the roster could not be loaded
         """
         try:
-            trainees = await self.fetch_all_trainees()
+            await self.fetch_all_trainees()
             
-            # Search for trainee with matching email (case insensitive)
-            email_lower = email.lower().strip()
+            # Case insensitive lookup through the email index
+            trainee = self._email_index.get(email.lower().strip())
             
-            for trainee in trainees:
-                # Handle different email field names from ProHub API
-                trainee_email = ""
-                for email_field in ['Trainee_Email','email', 'Email', 'emailAddress', 'mail']:
-                    if email_field in trainee:
-                        trainee_email = trainee.get(email_field, '').lower().strip()
-                        break
-                
-                if trainee_email == email_lower:
-                    logger.info(f"Found trainee: {trainee.get('name', trainee.get('Name', 'Unknown'))} ({email})")
-                    return trainee
+            if trainee:
+                logger.info(f"Found trainee: {trainee.name or 'Unknown'} ({email})")
+                return trainee
             
             logger.warning(f"Trainee not found with email: {email}")
             return None
             
+        except ProHubIntegrationError:
+            # Let callers tell "roster unavailable" apart from "not found"
+            raise
         except Exception as e:
             logger.error(f"Error finding trainee by email {email}: {e}")
             return None
 
     
     
-    async def find_trainee_by_id(self, trainee_id: str) -> Optional[Dict[str, Any]]:
+    async def find_trainee_by_id(self, trainee_id: str) -> Optional[TraineeRecord]:
         """
         Find trainee by ID
         
@@ -161,19 +932,14 @@ class ProHubIntegration:
             trainee_id: Trainee ID to search for
             
         Returns:
-            Trainee dictionary if found, None otherwise
+            Trainee record if found, None otherwise
         """
         try:
-            trainees = await self.fetch_all_trainees()
-            
-            for trainee in trainees:
-                # Handle different ID field names
-                for id_field in ['id', 'Id', 'ID', 'traineeId', 'TraineeId']:
-                    if id_field in trainee and str(trainee.get(id_field)) == str(trainee_id):
-                        return trainee
-            
-            return None
+            await self.fetch_all_trainees()
+            return self._id_index.get(str(trainee_id))
             
+        except ProHubIntegrationError:
+            raise
         except Exception as e:
             logger.error(f"Error finding trainee by ID {trainee_id}: {e}")
             return None
@@ -192,90 +958,47 @@ class ProHubIntegration:
         if not trainee:
             return False
         
-        # Check various status fields (ProHub might use different field names)
-        status_fields = ['status', 'Status', 'isActive', 'IsActive', 'active', 'Active']
-        
-        for field in status_fields:
-            if field in trainee:
-                value = trainee.get(field)
-                if isinstance(value, bool):
-                    return value
-                elif isinstance(value, str):
-                    return value.lower() in ['active', 'enrolled', 'true', '1', 'yes']
-        
-        # If no status field found, assume active
-        return True
+        return self._is_trainee_active(trainee)
     
-    def extract_trainee_info(self, trainee_data: Dict[str, Any]) -> Dict[str, str]:
+    def extract_trainee_info(self, trainee: TraineeRecord) -> Dict[str, str]:
         """
         Extract relevant trainee information for your system
         
         Args:
-            trainee_data: Raw trainee data from ProHub API
+            trainee: Normalized trainee record
             
         Returns:
             Cleaned trainee info dictionary
         """
-        # Handle different field name variations from ProHub API
-        intern_id = ""
-        for id_field in ['Trainee_ID','id', 'Id', 'ID', 'traineeId', 'TraineeId']:
-            if id_field in trainee_data:
-                intern_id = str(trainee_data.get(id_field, ''))
-                break
-        
-        email = ""
-        for email_field in ['Trainee_Email','email', 'Email', 'emailAddress', 'mail']:
-            if email_field in trainee_data:
-                email = trainee_data.get(email_field, '').strip()
-                break
-        
-        name = ""
-        for name_field in ['Trainee_Name','name', 'Name', 'fullName', 'FullName', 'trainee_name']:
-            if name_field in trainee_data:
-                name = trainee_data.get(name_field, '').strip()
-                break
-        
+        status = trainee.status if isinstance(trainee.status, str) else (
+            'active' if trainee.active else 'inactive'
+        )
         return {
-            "intern_id": intern_id,
-            "email": email,
-            "name": name or extract_name_from_email(email),
-            "department": trainee_data.get('department', trainee_data.get('Department', '')),
-            "batch": trainee_data.get('batch', trainee_data.get('Batch', '')),
-            "status": trainee_data.get('status', trainee_data.get('Status', 'active')),
-            "prohub_id": intern_id
+            "intern_id": trainee.intern_id,
+            "email": trainee.email,
+            "name": trainee.name or extract_name_from_email(trainee.email),
+            "department": trainee.department if trainee.department is not None else '',
+            "batch": trainee.batch if trainee.batch is not None else '',
+            "status": status,
+            "prohub_id": trainee.intern_id
         }
     
     async def get_all_active_trainees_summary(self) -> Dict[str, Any]:
         """
         Get summary of all active trainees for admin purposes
+        Served from the summary materialized at the last roster change
         
         Returns:
             Summary dictionary with counts and basic info
         """
         try:
-            trainees = await self.fetch_all_trainees()
+            await self.fetch_all_trainees()
             
-            summary = {
-                "total_trainees": len(trainees),
-                "active_count": 0,
-                "departments": {},
-                "batches": {},
-                "last_updated": self._cache_timestamp.isoformat() if self._cache_timestamp else None
-            }
-            
-            for trainee in trainees:
-                # Count active trainees
-                if self._is_trainee_active(trainee):
-                    summary["active_count"] += 1
-                
-                # Count by department
-                dept = trainee.get('department', trainee.get('Department', 'Unknown'))
-                summary["departments"][dept] = summary["departments"].get(dept, 0) + 1
-                
-                # Count by batch
-                batch = trainee.get('batch', trainee.get('Batch', 'Unknown'))
-                summary["batches"][batch] = summary["batches"].get(batch, 0) + 1
+            if self._roster_summary is None:
+                self._rebuild_summary()
             
+            summary = dict(self._roster_summary)
+            summary["last_updated"] = self._cache_timestamp.isoformat() if self._cache_timestamp else None
             return summary
             
         except Exception as e:
@@ -288,19 +1011,49 @@ class ProHubIntegration:
                 "batches": {}
             }
     
-    def _is_trainee_active(self, trainee: Dict[str, Any]) -> bool:
-        """Helper method to check if a single trainee is active"""
-        status_fields = ['status', 'Status', 'isActive', 'IsActive', 'active', 'Active']
+    def _rebuild_summary(self) -> None:
+        """Recount the roster summary (called whenever the cached roster changes)"""
+        trainees = self._trainees_cache or []
+        summary = {
+            "total_trainees": len(trainees),
+            "active_count": 0,
+            "inactive_count": 0,
+            "departments": {},
+            "batches": {},
+            "department_batch": {},
+            "active_by_department": {},
+            "active_by_batch": {},
+            "computed_at": datetime.now().isoformat()
+        }
         
-        for field in status_fields:
-            if field in trainee:
-                value = trainee.get(field)
-                if isinstance(value, bool):
-                    return value
-                elif isinstance(value, str):
-                    return value.lower() in ['active', 'enrolled', 'true', '1', 'yes']
+        for trainee in trainees:
+            dept = trainee.department if trainee.department is not None else 'Unknown'
+            batch = trainee.batch if trainee.batch is not None else 'Unknown'
+            
+            # Count by department, batch and department x batch
+            summary["departments"][dept] = summary["departments"].get(dept, 0) + 1
+            summary["batches"][batch] = summary["batches"].get(batch, 0) + 1
+            dept_batches = summary["department_batch"].setdefault(dept, {})
+            dept_batches[batch] = dept_batches.get(batch, 0) + 1
+            
+            # Count active trainees, overall and per department / batch
+            if trainee.active:
+                summary["active_count"] += 1
+                summary["active_by_department"][dept] = summary["active_by_department"].get(dept, 0) + 1
+                summary["active_by_batch"][batch] = summary["active_by_batch"].get(batch, 0) + 1
+            else:
+                summary["inactive_count"] += 1
         
-        return True  # Default to active if no status field
+        self._roster_summary = summary
+    
+    def is_cached_active(self, email: str) -> bool:
+        """Check if the cached roster lists email as an active trainee (no ProHub call)"""
+        trainee = self._email_index.get(email.lower())
+        return trainee is not None and self._is_trainee_active(trainee)
+    
+    def _is_trainee_active(self, trainee: TraineeRecord) -> bool:
+        """Helper method to check if a single trainee is active"""
+        return trainee.active
 
 
 class ProHubIntegrationError(Exception):
@@ -308,6 +1061,74 @@ class ProHubIntegrationError(Exception):
     pass
 
 
+class CircuitBreaker:
+    """
+    Circuit breaker for ProHub API calls
+    Opens after consecutive failures, then lets a single probe through
+    (half-open) once the reset timeout has passed
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self.rejected_calls = 0
+    
+    def allow_request(self) -> bool:
+        """Check if a call may go through, moving to half-open after the timeout"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                logger.info("ProHub circuit breaker half-open, probing ProHub API")
+                return True
+            self.rejected_calls += 1
+            return False
+        return True
+    
+    def record_success(self) -> None:
+        """Close the breaker after a successful call"""
+        if self.state != self.CLOSED:
+            logger.info("ProHub circuit breaker closed")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+    
+    def record_failure(self) -> None:
+        """Count a failure and open the breaker once the threshold is reached"""
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                logger.warning(
+                    f"ProHub circuit breaker opened after {self.consecutive_failures} failures, "
+                    f"retrying in {self.reset_timeout}s"
+                )
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+    
+    def status(self) -> Dict[str, Any]:
+        """Get breaker state for health reporting"""
+        retry_in = None
+        if self.state == self.OPEN:
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+            "retry_in_seconds": retry_in,
+            "times_opened": self.times_opened,
+            "rejected_calls": self.rejected_calls
+        }
+
+
 # Singleton instance for reuse across the application
 _prohub_integration = None
 
@@ -319,6 +1140,12 @@ def get_prohub_integration() -> ProHubIntegration:
     return _prohub_integration
 
 
+async def close_prohub_integration() -> None:
+    """Release the singleton's pooled HTTP client (called on app shutdown)"""
+    if _prohub_integration is not None:
+        await _prohub_integration.close()
+
+
 # Authentication middleware integration
 async def authenticate_via_prohub_email(email: str) -> Optional[Dict[str, str]]:
     """
@@ -334,16 +1161,23 @@ async def authenticate_via_prohub_email(email: str) -> Optional[Dict[str, str]]:
     try:
         integration = get_prohub_integration()
         
-        # Find trainee in ProHub system
+        # Skip the lookup for emails recently found unknown or inactive
+        if integration.is_negatively_cached(email):
+            logger.warning(f"Rejected recently unauthorized email (negative cache): {email}")
+            return None
+        
+        # Find trainee in ProHub system (single index lookup)
         trainee = await integration.find_trainee_by_email(email)
         
         if not trainee:
             logger.warning(f"User not found in ProHub system: {email}")
+            integration.remember_unauthorized(email, "not_found")
             return None
         
-        # Verify trainee is active
-        if not await integration.verify_trainee_active(email):
+        # Verify trainee is active using the record we already found
+        if not integration._is_trainee_active(trainee):
             logger.warning(f"Inactive trainee attempted access: {email}")
+            integration.remember_unauthorized(email, "inactive")
             return None
         
         # Extract and return user info
@@ -384,6 +1218,12 @@ async def check_prohub_api_health() -> Dict[str, Any]:
             "trainees_count": len(trainees),
             "cache_valid": integration._is_cache_valid(),
             "last_cache_update": integration._cache_timestamp.isoformat() if integration._cache_timestamp else None,
+            "cache_age_seconds": integration._cache_age_seconds(),
+            "cache_source": integration._cache_source,
+            "stale_while_revalidate": integration.stale_while_revalidate,
+            "refresh_stats": integration.get_refresh_stats(),
+            "circuit_breaker": integration.circuit_breaker.status(),
+            "negative_cache": integration._negative_cache.stats(),
             "timestamp": datetime.now().isoformat()
         }
         
@@ -395,9 +1235,42 @@ async def check_prohub_api_health() -> Dict[str, Any]:
             "response_time_seconds": None,
             "trainees_count": 0,
             "cache_valid": False,
+            "circuit_breaker": get_prohub_integration().circuit_breaker.status(),
             "timestamp": datetime.now().isoformat()
         }
 
+def get_prohub_status() -> Dict[str, Any]:
+    """
+    Report ProHub integration status from in-memory state only
+    Never triggers a roster download, so it is cheap enough for health probes
+    
+    Returns:
+        Health status dictionary ('healthy', 'degraded' when serving past the
+        hard expiry or with the breaker open, 'unhealthy' without a roster)
+    """
+    integration = get_prohub_integration()
+    breaker = integration.circuit_breaker.status()
+    
+    if not integration._trainees_cache:
+        status = "unhealthy"
+    elif breaker["state"] == CircuitBreaker.OPEN or not integration._is_within_max_stale_age():
+        status = "degraded"
+    else:
+        status = "healthy"
+    
+    return {
+        "status": status,
+        "api_url": integration.prohub_api_url,
+        "response_time_seconds": integration._refresh_stats.get("last_refresh_duration_seconds"),
+        "trainees_count": len(integration._trainees_cache or []),
+        "cache_valid": integration._is_cache_valid(),
+        "last_cache_update": integration._cache_timestamp.isoformat() if integration._cache_timestamp else None,
+        "cache_age_seconds": integration._cache_age_seconds(),
+        "cache_source": integration._cache_source,
+        "circuit_breaker": breaker["state"],
+        "timestamp": datetime.now().isoformat()
+    }
+
 def is_valid_company_email(email: str, allowed_domains: List[str] = None) -> bool:
     """
     Validate email format - Accept any valid email for now
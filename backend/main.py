@@ -8,23 +8,32 @@ from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import logging
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timedelta
 from bson import ObjectId
 import asyncio
+import json
 import os
+import time
 from config import Config
 from fastapi import HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi import Query
 from config import Config
 from database import (
     connect_to_mongo, close_mongo_connection, get_database, get_work_update_data,
     create_temp_work_update, get_temp_work_update, delete_temp_work_update,
     move_temp_to_permanent, cleanup_abandoned_temp_updates, get_database_stats,
-    verify_ttl_index
+    verify_ttl_index, record_history_digest_entry, digest_entry, pop_alternate_questions
 )
-from ai_service import AIFollowupService
+from ai_service import AIFollowupService, get_ai_followup_service, QuestionGenerationError
+from cache import TTLCache
+from auth_tokens import (
+    create_session_token, verify_session_token, revoke_session_tokens,
+    SessionTokenError, SessionTokenUnavailableError
+)
+from health import get_health_monitor
+from question_jobs import get_question_job_queue, PermanentJobError, job_is_finished, serialize_job
 from models import (
     GenerateQuestionsRequest, GenerateQuestionsResponse, 
     FollowupAnswersUpdate, AnalysisResponse, TestAIResponse, 
@@ -32,7 +41,7 @@ from models import (
 )
 from integration import (
     get_prohub_integration, authenticate_via_prohub_email, check_prohub_api_health,
-    ProHubIntegrationError, is_valid_company_email, extract_name_from_email
+    close_prohub_integration, ProHubIntegrationError, is_valid_company_email, extract_name_from_email
 )
 
 # Configure logging
@@ -45,6 +54,34 @@ logger = logging.getLogger(__name__)
 # Global variable to control the cleanup task
 cleanup_task = None
 
+# Global variable to control the ProHub roster refresh task
+prohub_refresh_task = None
+
+# Global variable to control the background health probe task
+health_task = None
+
+# Global variable to control the Gemini warm-up task
+ai_warmup_task = None
+
+# Auth result cache: normalized email -> extracted ProHub user_info
+auth_cache = TTLCache(maxsize=Config.AUTH_CACHE_SIZE, ttl=Config.AUTH_CACHE_TTL)
+
+def invalidate_auth_cache(changed_emails=None):
+    """
+    Drop cached auth results when the ProHub roster changes, and revoke the
+    session tokens of interns who were removed or deactivated
+    """
+    if changed_emails is None:
+        auth_cache.clear()
+    else:
+        integration = get_prohub_integration()
+        for email in changed_emails:
+            auth_cache.pop(email)
+            if not integration.is_cached_active(email):
+                revoke_session_tokens(email)
+
+get_prohub_integration().add_refresh_listener(invalidate_auth_cache)
+
 async def scheduled_cleanup_task():
     """Background task that runs cleanup every hour (backup to TTL)"""
     while True:
@@ -80,7 +117,7 @@ async def scheduled_cleanup_task():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
-    global cleanup_task
+    global cleanup_task, prohub_refresh_task, health_task, ai_warmup_task
     
     # Startup
     try:
@@ -94,17 +131,39 @@ async def lifespan(app: FastAPI):
         else:
             logger.warning("⚠️ TTL index not found - relying on manual cleanup")
         
-        # Test ProHub API connection
-        prohub_health = await check_prohub_api_health()
-        if prohub_health["status"] == "healthy":
-            logger.info(f"✅ ProHub API connection verified - {prohub_health['trainees_count']} trainees found")
+        # Warm start from the persisted ProHub roster; ProHub is reconciled in the background
+        integration = get_prohub_integration()
+        if await integration.load_snapshot():
+            logger.info("✅ ProHub roster served from snapshot until background refresh completes")
         else:
-            logger.warning(f"⚠️ ProHub API connection issue: {prohub_health.get('error', 'Unknown error')}")
+            logger.warning("⚠️ No ProHub roster snapshot - first requests wait for the background refresh")
+        
+        # Create the AI service once; it is reused by every request
+        try:
+            ai_service = get_ai_followup_service()
+            ai_warmup_task = asyncio.create_task(ai_service.warm_up())
+            logger.info(f"✅ AI service ready ({ai_service.init_stats['construction_seconds']}s), warming up Gemini model")
+        except Exception as e:
+            logger.warning(f"⚠️ AI service not initialized at startup, will retry on first use: {e}")
+        
+        # Question generation jobs queued by POST /api/followups/start?job=true
+        get_question_job_queue().start(run_question_job)
         
         # Start the background cleanup task (as backup to TTL)
         cleanup_task = asyncio.create_task(scheduled_cleanup_task())
         logger.info("Background cleanup task started (backup to TTL)")
         
+        # Reconcile with ProHub and keep the roster warm so requests never wait on ProHub
+        prohub_refresh_task = asyncio.create_task(integration.run_background_refresh())
+        if Config.PROHUB_STALE_WHILE_REVALIDATE:
+            logger.info(f"Background ProHub roster refresh started (every {Config.PROHUB_REFRESH_INTERVAL}s)")
+        else:
+            logger.info("Background ProHub roster reconciliation started")
+        
+        # Health endpoints serve results cached by this task
+        health_task = asyncio.create_task(get_health_monitor().run())
+        logger.info(f"Background health checks started (every {Config.HEALTH_CHECK_INTERVAL}s)")
+        
         logger.info("Application started successfully with ProHub integration")
     except Exception as e:
         logger.error(f"Failed to start application: {e}")
@@ -120,6 +179,29 @@ async def lifespan(app: FastAPI):
         except asyncio.CancelledError:
             logger.info("Background cleanup task cancelled")
     
+    if prohub_refresh_task:
+        prohub_refresh_task.cancel()
+        try:
+            await prohub_refresh_task
+        except asyncio.CancelledError:
+            logger.info("Background ProHub refresh task cancelled")
+    
+    if health_task:
+        health_task.cancel()
+        try:
+            await health_task
+        except asyncio.CancelledError:
+            logger.info("Background health check task cancelled")
+    
+    if ai_warmup_task and not ai_warmup_task.done():
+        ai_warmup_task.cancel()
+        try:
+            await ai_warmup_task
+        except asyncio.CancelledError:
+            logger.info("Gemini warm-up task cancelled")
+    
+    await get_question_job_queue().stop()
+    await close_prohub_integration()
     await close_mongo_connection()
     logger.info("Application shutdown complete")
 
@@ -141,6 +223,32 @@ app.add_middleware(
 )
 
 async def get_current_intern(request: Request) -> dict:
+    """
+    Resolve the current intern from a signed session token or email headers
+    Session tokens from /api/auth/login are validated without any roster access
+    """
+    # Method 0: Signed session token issued by /api/auth/login
+    auth_header = request.headers.get("Authorization")
+    if auth_header and auth_header.startswith("Bearer "):
+        try:
+            return verify_session_token(auth_header[len("Bearer "):].strip())
+        except SessionTokenUnavailableError as e:
+            # Fail closed: without the signing secret no token can be trusted
+            logger.error(f"Session token not checked: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail="Session tokens are not available. Use email authentication."
+            )
+        except SessionTokenError as e:
+            logger.warning(f"Session token rejected: {e}")
+            raise HTTPException(
+                status_code=401,
+                detail="Invalid or expired session token. Please log in again."
+            )
+    
+    return await get_intern_from_email(request)
+
+async def get_intern_from_email(request: Request) -> dict:
     """
     Extract intern information from ProHub system via email authentication
     Accepts any email format - ProHub API validates if user is a trainee
@@ -173,6 +281,12 @@ async def get_current_intern(request: Request) -> dict:
                 detail="Invalid email format provided."
             )
         
+        # Reuse a recent auth result for this identity
+        email_key = user_email.lower().strip()
+        cached_user_info = auth_cache.get(email_key)
+        if cached_user_info is not None:
+            logger.debug(f"Auth cache hit: {cached_user_info['name']} ({user_email})")
+            return dict(cached_user_info)
        
         # Authenticate via ProHub API
         user_info = await authenticate_via_prohub_email(user_email)
@@ -184,6 +298,7 @@ async def get_current_intern(request: Request) -> dict:
             )
         
         logger.info(f"ProHub authentication successful: {user_info['name']} ({user_email})")
+        auth_cache.set(email_key, dict(user_info))
         
         return user_info
         
@@ -202,11 +317,27 @@ async def get_current_intern(request: Request) -> dict:
             detail="Authentication system error. Please contact support."
         )
 
+def build_ai_input(work_update: dict, intern_id: str) -> dict:
+    """Map a temp work update to the AI service's question-generation input"""
+    return {
+        "description": work_update.get("task", ""),  # Map task to description
+        "challenges": work_update.get("progress", ""),
+        "plans": work_update.get("blockers", ""),
+        "user_id": intern_id
+    }
+
+async def update_history_digest(intern_id: str, record: dict) -> None:
+    """Fold a finalized daily record into the intern's history digest (best effort)"""
+    try:
+        await record_history_digest_entry(intern_id, digest_entry(record))
+    except Exception as e:
+        logger.warning(f"⚠️ Could not update history digest for {intern_id}: {e}")
+
 # Dependency to get AI service
 async def get_ai_service() -> AIFollowupService:
-    """Get AI service instance"""
+    """Get the shared AI service instance"""
     try:
-        return AIFollowupService()
+        return get_ai_followup_service()
     except Exception as e:
         logger.error(f"Failed to initialize AI service: {e}")
         raise HTTPException(
@@ -217,8 +348,9 @@ async def get_ai_service() -> AIFollowupService:
 @app.get("/")
 async def root():
     """Root endpoint with ProHub integration info"""
-    ttl_status = await verify_ttl_index()
-    prohub_health = await check_prohub_api_health()
+    monitor = get_health_monitor()
+    ttl_status = monitor.ttl_index_active()
+    prohub_health = monitor.prohub_health()
     
     return {
         "message": "Intern Management AI Service with ProHub Integration",
@@ -234,41 +366,59 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint with ProHub integration status"""
-    try:
-        db = get_database()
-        # Test database connection
-        await db.command("ping")
-        
-        # Check TTL status
-        ttl_working = await verify_ttl_index()
-        
-        # Check ProHub API health
-        prohub_health = await check_prohub_api_health()
-        
-        return {
-            "status": "healthy",
-            "database": "connected",
-            "ttl_index": "active" if ttl_working else "not_found",
-            "automatic_cleanup": "enabled" if ttl_working else "disabled",
-            "cleanup_task_running": cleanup_task and not cleanup_task.done(),
-            "prohub_integration": prohub_health["status"],
-            "prohub_trainees_count": prohub_health.get("trainees_count", 0),
-            "prohub_response_time": prohub_health.get("response_time_seconds"),
-            "authentication": "ProHub API integration ready",
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
+    """Health check endpoint with ProHub integration status (cached probe results)"""
+    monitor = get_health_monitor()
+    ttl_working = monitor.ttl_index_active()
+    prohub_health = monitor.prohub_health()
+    snapshot = monitor.snapshot()
+    
+    if not monitor.database_ok():
+        database_check = snapshot["checks"].get("database", {})
         return {
             "status": "unhealthy",
-            "error": str(e),
+            "error": database_check.get("error") or "Database health not checked yet",
             "ttl_index": "unknown",
             "cleanup_task_running": False,
-            "prohub_integration": "error",
+            "prohub_integration": prohub_health["status"],
             "authentication": "error",
+            "checked_at": snapshot["checked_at"],
+            "check_age_seconds": snapshot["check_age_seconds"],
             "timestamp": datetime.now().isoformat()
         }
+    
+    return {
+        "status": "healthy",
+        "database": "connected",
+        "ttl_index": "active" if ttl_working else "not_found",
+        "automatic_cleanup": "enabled" if ttl_working else "disabled",
+        "cleanup_task_running": cleanup_task and not cleanup_task.done(),
+        "prohub_integration": prohub_health["status"],
+        "prohub_trainees_count": prohub_health.get("trainees_count", 0),
+        "prohub_response_time": prohub_health.get("response_time_seconds"),
+        "authentication": "ProHub API integration ready",
+        "checked_at": snapshot["checked_at"],
+        "check_age_seconds": snapshot["check_age_seconds"],
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: 503 while cached health results are stale or unhealthy"""
+    monitor = get_health_monitor()
+    ready, reasons = monitor.readiness()
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "reasons": reasons,
+        "max_age_seconds": monitor.ready_max_age,
+        **monitor.snapshot(),
+        "timestamp": datetime.now().isoformat()
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
 
 # ProHub API endpoints
 @app.get("/api/prohub/health")
@@ -302,8 +452,15 @@ async def refresh_prohub_cache(current_intern: dict = Depends(get_current_intern
         integration = get_prohub_integration()
         trainees = await integration.fetch_all_trainees(force_refresh=True)
         
+        if integration._cache_source == "prohub":
+            message = "ProHub cache refreshed successfully"
+        else:
+            # Another worker holds the refresh lease; its latest roster was loaded
+            message = "ProHub cache synced from the shared roster"
+        
         return {
-            "message": "ProHub cache refreshed successfully",
+            "message": message,
+            "source": integration._cache_source,
             "trainees_count": len(trainees),
             "refreshed_by": current_intern["name"],
             "timestamp": datetime.now().isoformat()
@@ -378,6 +535,7 @@ async def create_work_update(
                 is_override = False
 
             logger.info(f"LEAVE record saved to LogBook for intern {intern_id}: {record_id}")
+            await update_history_digest(intern_id, record_dict)
             
             return {
                 "message": f"Leave status saved successfully for {current_intern['name']}",
@@ -408,12 +566,24 @@ async def create_work_update(
                 "followupCompleted": False,
                 "temp_status": "pending_followup"
             }
+            ai_input_data = build_ai_input(update_dict, intern_id)
+            # Pre-generated questions are only stored while they match these inputs
+            update_dict["aiInputHash"] = AIFollowupService.work_input_hash(intern_id, ai_input_data)
 
             # Use database function to create temp work update
             temp_work_update_id = await create_temp_work_update(update_dict)
             
             logger.info(f"WORKING/WFH record saved to temp collection for intern {intern_id} (TTL: 24h): {temp_work_update_id}")
             
+            # Generate follow-up questions while the intern moves to the follow-up page
+            if Config.QUESTION_PREGENERATION:
+                try:
+                    get_ai_followup_service().schedule_pregeneration(
+                        temp_work_update_id, intern_id, ai_input_data
+                    )
+                except Exception as e:
+                    logger.warning(f"Could not start question pre-generation: {e}")
+            
             return {
                 "message": f"Work update saved temporarily for {current_intern['name']}. Complete AI follow-up within 24 hours to finalize in LogBook.",
                 "tempWorkUpdateId": temp_work_update_id,  
@@ -436,69 +606,135 @@ async def create_work_update(
             detail=f"Failed to create work update: {str(e)}"
         )
  
+async def get_owned_temp_work_update(temp_work_update_id: str, intern_id: str) -> dict:
+    """Get a temporary work update, checking it belongs to the authenticated intern"""
+    temp_work_update = await get_temp_work_update(temp_work_update_id)
+    if not temp_work_update:
+        raise HTTPException(
+            status_code=404, 
+            detail="Temporary work update not found (may have been auto-deleted after 24h)"
+        )
+
+    # Verify the temp work update belongs to the authenticated intern
+    if str(temp_work_update.get("internId")) != str(intern_id):
+        raise HTTPException(
+            status_code=403,
+            detail="Access denied - work update belongs to different intern"
+        )
+    return temp_work_update
+
+async def create_followup_session(intern_id: str, temp_work_update_id: str, temp_work_update: dict,
+                                  ai_service: AIFollowupService, fallback: bool = True,
+                                  deadline: Optional[float] = None) -> dict:
+    """
+    Generate questions for a temp work update and store the pending follow-up session
+    
+    Args:
+        fallback: Use locally built questions when Gemini fails, instead of raising
+        deadline: time.monotonic() value covering both waiting for pre-generation
+            and generating afresh (None for queued jobs, which nobody blocks on)
+    
+    Returns:
+        Dictionary with sessionId and questions
+    
+    Raises:
+        QuestionGenerationError: If Gemini failed and fallback is False
+    """
+    db = get_database()
+    followup_collection = db[Config.FOLLOWUP_SESSIONS_COLLECTION]
+    
+    today_date = datetime.now().strftime('%Y-%m-%d')
+    session_date_id = f"{intern_id}_{uuid.uuid4().hex}"
+
+    # Generate questions using temp data, unless they were pre-generated at submission
+    ai_input_data = build_ai_input(temp_work_update, intern_id)
+    
+    question_sets = await ai_service.get_pregenerated_questions(temp_work_update, intern_id, ai_input_data, deadline=deadline)
+    if question_sets:
+        logger.info(f"Using pre-generated AI questions for temp update {temp_work_update_id}")
+    else:
+        logger.info(f"Generating AI questions with data: {ai_input_data}")
+        question_sets = await ai_service.generate_question_sets(
+            intern_id, work_update_data=ai_input_data, deadline=deadline, fallback=fallback
+        )
+        if not question_sets:
+            raise QuestionGenerationError("Gemini did not produce follow-up questions")
+    questions = question_sets[0]
+
+    session_doc = {
+        "_id": session_date_id,
+        "internId": intern_id,
+        "tempWorkUpdateId": temp_work_update_id, 
+        "session_date": today_date,
+        "questions": questions,
+        # Extra sets from the same model call, served by the regenerate endpoint
+        "alternateQuestions": question_sets[1:],
+        "answers": [""] * len(questions),
+        "status": SessionStatus.PENDING,
+        "createdAt": datetime.now(),
+        "completedAt": None
+    }
+    
+    await followup_collection.replace_one({"_id": session_date_id}, session_doc, upsert=True)
+
+    logger.info(f"Follow-up session created: {session_date_id}")
+    return {"sessionId": session_date_id, "questions": questions}
+
+async def run_question_job(job: dict) -> dict:
+    """
+    Question job handler: create the follow-up session for a queued job
+    Model failures raise (and are retried with backoff) until the last
+    attempt, which falls back to locally built questions.
+    """
+    temp_work_update = await get_temp_work_update(job["tempWorkUpdateId"])
+    if not temp_work_update:
+        raise PermanentJobError("Temporary work update not found (may have been auto-deleted after 24h)")
+    
+    final_attempt = job.get("attempts", 1) >= job.get("maxAttempts", Config.QUESTION_JOB_MAX_ATTEMPTS)
+    return await create_followup_session(
+        job["internId"], job["tempWorkUpdateId"], temp_work_update, get_ai_followup_service(),
+        fallback=final_attempt
+    )
+
 @app.post("/api/followups/start")
 async def start_followup_session(
     temp_work_update_id: str = Query(..., description="Temporary work update ID"),
+    job: bool = Query(False, description="Queue question generation and return a job ID immediately"),
     current_intern: dict = Depends(get_current_intern),
     ai_service: AIFollowupService = Depends(get_ai_service)
 ):
     """Start follow-up session using temporary work update data"""
     try:
-        db = get_database()
-        followup_collection = db[Config.FOLLOWUP_SESSIONS_COLLECTION]
         intern_id = current_intern["intern_id"]
         
         logger.info(f"Starting follow-up session for intern {intern_id} with temp update {temp_work_update_id}")
 
         # Get TEMPORARY work update data
-        temp_work_update = await get_temp_work_update(temp_work_update_id)
-        if not temp_work_update:
-            raise HTTPException(
-                status_code=404, 
-                detail="Temporary work update not found (may have been auto-deleted after 24h)"
-            )
-
-        # Verify the temp work update belongs to the authenticated intern
-        if str(temp_work_update.get("internId")) != str(intern_id):
-            raise HTTPException(
-                status_code=403,
-                detail="Access denied - work update belongs to different intern"
-            )
-
-        today_date = datetime.now().strftime('%Y-%m-%d')
-        session_date_id = f"{intern_id}_{uuid.uuid4().hex}"
-
-        # Generate questions using temp data
-        ai_input_data = {
-            "description": temp_work_update.get("task", ""),  # Map task to description
-            "challenges": temp_work_update.get("progress", ""),
-            "plans": temp_work_update.get("blockers", ""),
-            "user_id": intern_id
-        }
-        
-        logger.info(f"Generating AI questions with data: {ai_input_data}")
-        questions = await ai_service.generate_followup_questions(intern_id, work_update_data=ai_input_data)
-
-        session_doc = {
-            "_id": session_date_id,
-            "internId": intern_id,
-            "tempWorkUpdateId": temp_work_update_id, 
-            "session_date": today_date,
-            "questions": questions,
-            "answers": [""] * len(questions),
-            "status": SessionStatus.PENDING,
-            "createdAt": datetime.now(),
-            "completedAt": None
-        }
+        temp_work_update = await get_owned_temp_work_update(temp_work_update_id, intern_id)
         
-        await followup_collection.replace_one({"_id": session_date_id}, session_doc, upsert=True)
+        if job:
+            # Job mode: a worker generates the questions; poll or subscribe for the result
+            queued_job = await get_question_job_queue().enqueue(intern_id, temp_work_update_id)
+            job_id = queued_job["_id"]
+            logger.info(f"Question generation job {job_id} queued for intern {intern_id}")
+            return JSONResponse(status_code=202, content={
+                "message": f"AI follow-up question generation queued for {current_intern['name']}",
+                "jobId": job_id,
+                "status": queued_job["status"],
+                "statusUrl": f"/api/followups/jobs/{job_id}",
+                "eventsUrl": f"/api/followups/jobs/{job_id}/events"
+            })
 
-        logger.info(f"Follow-up session created: {session_date_id}")
+        # The intern is waiting: generation is held to the interactive latency budget
+        session = await create_followup_session(
+            intern_id, temp_work_update_id, temp_work_update, ai_service,
+            deadline=ai_service.interactive_deadline()
+        )
 
         return {
             "message": f"AI follow-up session started for {current_intern['name']}",
-            "sessionId": session_date_id,
-            "questions": questions,
+            "sessionId": session["sessionId"],
+            "questions": session["questions"],
             "reminder": "Complete within 24 hours before auto-deletion",
             "internInfo": {
                 "name": current_intern["name"],
@@ -517,6 +753,69 @@ async def start_followup_session(
             detail=f"Failed to start follow-up session: {str(e)}"
         )
 
+async def get_owned_question_job(job_id: str, intern_id: str) -> dict:
+    """Get a question job, checking it belongs to the authenticated intern"""
+    job = await get_question_job_queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Question generation job not found")
+    if str(job.get("internId")) != str(intern_id):
+        raise HTTPException(
+            status_code=403,
+            detail="Access denied - job belongs to different intern"
+        )
+    return job
+
+@app.get("/api/followups/jobs/{job_id}")
+async def get_question_job_status(
+    job_id: str,
+    current_intern: dict = Depends(get_current_intern)
+):
+    """Poll a question generation job; result holds sessionId and questions once succeeded"""
+    job = await get_owned_question_job(job_id, current_intern["intern_id"])
+    return serialize_job(job)
+
+@app.get("/api/followups/jobs/{job_id}/events")
+async def stream_question_job_events(
+    job_id: str,
+    request: Request,
+    current_intern: dict = Depends(get_current_intern)
+):
+    """Server-Sent Events stream of a question generation job until it finishes"""
+    await get_owned_question_job(job_id, current_intern["intern_id"])
+    queue = get_question_job_queue()
+    
+    async def event_stream():
+        last_state = None
+        last_sent = time.monotonic()
+        deadline = time.monotonic() + Config.QUESTION_JOB_LEASE * Config.QUESTION_JOB_MAX_ATTEMPTS
+        while not await request.is_disconnected():
+            job = await queue.get(job_id)
+            if job is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Job not found'})}\n\n"
+                return
+            
+            state = (job["status"], job.get("attempts"))
+            if state != last_state:
+                last_state, last_sent = state, time.monotonic()
+                event = "done" if job_is_finished(job) else "status"
+                yield f"event: {event}\ndata: {json.dumps(serialize_job(job))}\n\n"
+                if event == "done":
+                    return
+            elif time.monotonic() - last_sent >= 15:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            
+            if time.monotonic() > deadline:
+                yield f"event: timeout\ndata: {json.dumps({'jobId': job_id})}\n\n"
+                return
+            await queue.wait_for_change(job_id, timeout=Config.QUESTION_JOB_POLL_INTERVAL)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 @app.put("/api/followup/{session_id}/complete")
 async def complete_followup_session(
@@ -616,6 +915,8 @@ async def complete_followup_session(
             final_record_id = str(result.inserted_id)
             logger.info(f"Created new LogBook record for intern {intern_id}: {final_record_id}")
 
+        await update_history_digest(intern_id, daily_record)
+
         # Update session with final record ID
         await followup_collection.update_one(
             {"_id": session_id},
@@ -648,17 +949,99 @@ async def complete_followup_session(
             detail=f"Failed to complete follow-up: {str(e)}"
         )
 
+@app.post("/api/followup/{session_id}/regenerate")
+async def regenerate_followup_questions(
+    session_id: str,
+    current_intern: dict = Depends(get_current_intern),
+    ai_service: AIFollowupService = Depends(get_ai_service)
+):
+    """Replace a pending session's questions with a stored alternate set, generating new sets only when none are left"""
+    try:
+        db = get_database()
+        followup_collection = db[Config.FOLLOWUP_SESSIONS_COLLECTION]
+        intern_id = current_intern["intern_id"]
+        
+        session = await followup_collection.find_one({"_id": session_id})
+        if not session:
+            raise HTTPException(status_code=404, detail="Follow-up session not found")
+        
+        if str(session.get("internId")) != str(intern_id):
+            raise HTTPException(
+                status_code=403,
+                detail="Access denied - session belongs to different intern"
+            )
+        
+        if session.get("status") != SessionStatus.PENDING:
+            raise HTTPException(status_code=400, detail="Only pending follow-up sessions can get new questions")
+        
+        previous = await pop_alternate_questions(session_id)
+        if previous:
+            # Served from storage: no model call
+            questions = previous["alternateQuestions"][0]
+            alternates_left = len(previous["alternateQuestions"]) - 1
+            source = "stored"
+            session_update = {}
+        else:
+            temp_work_update = await get_temp_work_update(session["tempWorkUpdateId"])
+            if not temp_work_update:
+                raise HTTPException(
+                    status_code=404,
+                    detail="Temporary work update not found (may have been auto-deleted due to TTL expiry)"
+                )
+            
+            # The cached sets for this prompt are the ones already used up
+            question_sets = await ai_service.generate_question_sets(
+                intern_id, work_update_data=build_ai_input(temp_work_update, intern_id),
+                deadline=ai_service.interactive_deadline(), use_cache=False
+            )
+            questions = question_sets[0]
+            alternates_left = len(question_sets) - 1
+            source = "generated"
+            session_update = {"alternateQuestions": question_sets[1:]}
+        
+        await followup_collection.update_one(
+            {"_id": session_id},
+            {
+                "$set": {
+                    **session_update,
+                    "questions": questions,
+                    "answers": [""] * len(questions),
+                    "regeneratedAt": datetime.now()
+                },
+                "$push": {"previousQuestions": (previous or session)["questions"]},
+                "$inc": {"regenerations": 1}
+            }
+        )
+        
+        logger.info(f"Follow-up questions regenerated for session {session_id} ({source}, {alternates_left} alternates left)")
+        
+        return {
+            "message": f"New follow-up questions for {current_intern['name']}",
+            "sessionId": session_id,
+            "questions": questions,
+            "source": source,
+            "alternatesRemaining": alternates_left
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to regenerate follow-up questions: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to regenerate follow-up questions: {str(e)}"
+        )
+
 @app.get("/stats")
 async def get_stats():
     """Get database statistics including ProHub integration status"""
     try:
         stats = await get_database_stats()
         
-        # Add cleanup task status to stats
-        ttl_status = await verify_ttl_index()
-        
-        # Add ProHub integration status
-        prohub_health = await check_prohub_api_health()
+        # Add cleanup task and ProHub integration status (cached probe results)
+        monitor = get_health_monitor()
+        ttl_status = monitor.ttl_index_active()
+        prohub_health = monitor.prohub_health()
         
         if stats:
             stats["cleanup_system"] = {
@@ -673,8 +1056,32 @@ async def get_stats():
                 "prohub_response_time": prohub_health.get("response_time_seconds"),
                 "daily_records_collection": "dailyrecords",
                 "authentication": "ProHub API + Google OAuth",
-                "cache_valid": prohub_health.get("cache_valid", False)
+                "cache_valid": prohub_health.get("cache_valid", False),
+                "auth_cache": auth_cache.stats()
             }
+            try:
+                ai_service = get_ai_followup_service()
+                stats["ai_service"] = {
+                    **ai_service.init_stats,
+                    "question_cache": ai_service.get_question_cache_stats(),
+                    "pregeneration": {
+                        **ai_service.pregeneration_stats,
+                        "in_flight": len(ai_service._pregeneration_tasks)
+                    },
+                    "question_jobs": get_question_job_queue().get_stats(),
+                    "gemini_governor": ai_service.governor.get_stats(),
+                    "history_digest": ai_service.history_stats,
+                    "latency": {
+                        **ai_service.latency_stats,
+                        "budget_seconds": Config.QUESTION_LATENCY_BUDGET,
+                        "hedge_delay_seconds": round(ai_service.hedge_delay(), 3),
+                        "latency_samples": len(ai_service.gemini_latency),
+                        "p50_seconds": ai_service.gemini_latency.percentile(50),
+                        "p90_seconds": ai_service.gemini_latency.percentile(90)
+                    }
+                }
+            except Exception as e:
+                stats["ai_service"] = {"error": str(e)}
         
         return stats
     except Exception as e:
@@ -814,16 +1221,52 @@ async def cleanup_abandoned_temp_updates_endpoint():
             detail=f"Failed to cleanup: {str(e)}"
         )
 
+@app.post("/api/auth/login")
+async def login(current_intern: dict = Depends(get_intern_from_email)):
+    """
+    Verify the intern's email through ProHub once and issue a signed session token
+    Send it as 'Authorization: Bearer {token}' to skip roster lookups on later requests
+    """
+    try:
+        token, expires_at = create_session_token(current_intern)
+    except SessionTokenError as e:
+        logger.error(f"Failed to issue session token: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Session tokens are not available. Use email authentication."
+        )
+    
+    logger.info(f"Session token issued for {current_intern['name']} ({current_intern['email']})")
+    
+    return {
+        "message": f"Login successful for {current_intern['name']}",
+        "access_token": token,
+        "token_type": "Bearer",
+        "expires_in": Config.SESSION_TOKEN_TTL,
+        "expires_at": expires_at.isoformat(),
+        "internInfo": {
+            "name": current_intern["name"],
+            "email": current_intern["email"],
+            "department": current_intern.get("department", "")
+        }
+    }
+
 # Auth configuration endpoint for frontend
 @app.get("/api/auth/config")
 async def get_auth_config():
     """Get authentication configuration for frontend integration"""
-    prohub_health = await check_prohub_api_health()
+    prohub_health = get_health_monitor().prohub_health()
     
     return {
         "auth_method": "prohub_email",
         "required_headers": ["X-User-Email", "User-Email"],
         "alternative_headers": ["Authorization: Email {email}"],
+        "session_token": {
+            "login_endpoint": "/api/auth/login",
+            "header": "Authorization: Bearer {token}",
+            "enabled": bool(Config.SESSION_TOKEN_SECRET),
+            "expires_in": Config.SESSION_TOKEN_TTL
+        },
         "prohub_api_status": prohub_health["status"],
         "trainees_available": prohub_health.get("trainees_count", 0),
         "integration_status": "ProHub API + Google OAuth",
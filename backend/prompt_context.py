@@ -0,0 +1,119 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Rough size of a Gemini token in characters of English text
+CHARS_PER_TOKEN = 4
+
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9+#.\-]*")
+_STOP_WORDS = frozenset(
+    "a an and are as at be but by did do for from had has have i in is it its my "
+    "of on or so that the them then there this to was we were will with".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the Gemini token count of text (about 4 characters per token)"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, at a word boundary, marking the cut with '...'"""
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * CHARS_PER_TOKEN - 3)
+    cut = text[:limit]
+    if ' ' in cut:
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip(' ,;:.') + '...'
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words of text without stop words and single characters"""
+    words = (word.strip('.-') for word in _WORD_RE.findall(text.lower()))
+    return [word for word in words if len(word) > 1 and word not in _STOP_WORDS]
+
+
+def tfidf_similarities(query: str, documents: List[str]) -> List[float]:
+    """
+    Cosine similarity between the TF-IDF vectors of query and each document
+    IDF is computed over the documents plus the query, so terms common to
+    every entry (e.g. the project name) count for little.
+
+    Args:
+        query: Text to rank against (today's work update)
+        documents: Candidate texts (history entries)
+
+    Returns:
+        One similarity in [0, 1] per document
+    """
+    counts = [Counter(tokenize(text)) for text in [query] + documents]
+    document_frequency = Counter(term for count in counts for term in count)
+    total = len(counts)
+    idf = {term: math.log((1 + total) / (1 + df)) + 1 for term, df in document_frequency.items()}
+
+    vectors = []
+    for count in counts:
+        length = sum(count.values()) or 1
+        vector = {term: (n / length) * idf[term] for term, n in count.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        vectors.append((vector, norm))
+
+    query_vector, query_norm = vectors[0]
+    similarities = []
+    for vector, norm in vectors[1:]:
+        if not query_norm or not norm:
+            similarities.append(0.0)
+            continue
+        dot = sum(weight * vector.get(term, 0.0) for term, weight in query_vector.items())
+        similarities.append(dot / (query_norm * norm))
+    return similarities
+
+
+def select_history(query: str, entries: List[Tuple[str, str]], token_budget: int) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Fit work history into a token budget, most relevant entries first
+    Entries are ranked by TF-IDF similarity to query (ties go to the more
+    recent entry). Every entry starts as its summary; the best-ranked ones
+    are then expanded to full text while budget remains. If even the
+    summaries do not fit, the least relevant entries are left out.
+
+    Args:
+        query: Today's work update text
+        entries: (full text, summary) per history entry, newest first
+        token_budget: Estimated tokens the history may use
+
+    Returns:
+        Tuple of (texts to include in their original order, counts of
+        full / summarized / dropped entries)
+    """
+    scores = tfidf_similarities(query, [full for full, _ in entries]) if query else [0.0] * len(entries)
+    ranked = sorted(range(len(entries)), key=lambda index: (-scores[index], index))
+
+    chosen: Dict[int, str] = {}
+    remaining = token_budget
+    for index in ranked:
+        cost = estimate_tokens(entries[index][1])
+        if cost <= remaining:
+            chosen[index] = entries[index][1]
+            remaining -= cost
+
+    full_count = 0
+    for index in ranked:
+        if index not in chosen:
+            continue
+        extra = estimate_tokens(entries[index][0]) - estimate_tokens(entries[index][1])
+        if extra <= remaining:
+            chosen[index] = entries[index][0]
+            remaining -= extra
+            full_count += 1
+
+    counts = {
+        "full": full_count,
+        "summarized": len(chosen) - full_count,
+        "dropped": len(entries) - len(chosen)
+    }
+    return [chosen[index] for index in sorted(chosen)], counts
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import Config
+from database import (
+    enqueue_question_job, claim_question_job, finish_question_job, get_question_job,
+    JOB_SUCCEEDED, JOB_FAILED
+)
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler when retrying cannot help (e.g. the work update is gone)"""
+    pass
+
+
+class QuestionJobQueue:
+    """
+    MongoDB-backed queue for follow-up question generation
+    Jobs are claimed with a lease, so a job whose worker dies is picked up
+    again once the lease expires; failures are retried with exponential backoff.
+    """
+
+    def __init__(self, concurrency: int, poll_interval: float, lease_seconds: int,
+                 max_attempts: int, backoff_seconds: float, retention_seconds: int):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.retention_seconds = retention_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handler: Optional[JobHandler] = None
+        self._workers: List[asyncio.Task] = []
+        # Wakes idle workers when this process enqueues a job
+        self._wakeup = asyncio.Event()
+        # Job ID -> events set when this process finishes the job (for SSE streams)
+        self._job_events: Dict[str, List[asyncio.Event]] = {}
+        self.stats = {
+            "enqueued": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retried": 0,
+            "running": 0
+        }
+
+    def start(self, handler: JobHandler) -> None:
+        """Start the worker pool (called from the FastAPI lifespan)"""
+        self._handler = handler
+        self._workers = [
+            asyncio.create_task(self._worker_loop(index)) for index in range(self.concurrency)
+        ]
+        logger.info(f"Question job workers started ({self.concurrency} concurrent jobs)")
+
+    async def stop(self) -> None:
+        """Stop the worker pool; jobs in progress are retried after their lease expires"""
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            try:
+                await worker
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        logger.info("Question job workers stopped")
+
+    async def enqueue(self, intern_id: str, temp_work_update_id: str) -> Dict[str, Any]:
+        """Queue a job (or return the unfinished one for the same work update)"""
+        job, created = await enqueue_question_job(intern_id, temp_work_update_id, self.max_attempts)
+        if created:
+            self.stats["enqueued"] += 1
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await get_question_job(job_id)
+
+    async def wait_for_change(self, job_id: str, timeout: float) -> None:
+        """Wait until this process finishes the job, or at most timeout seconds"""
+        event = asyncio.Event()
+        self._job_events.setdefault(job_id, []).append(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._job_events.get(job_id, [])
+            if event in waiters:
+                waiters.remove(event)
+            if not waiters:
+                self._job_events.pop(job_id, None)
+
+    def _notify(self, job_id: str) -> None:
+        for event in self._job_events.get(job_id, []):
+            event.set()
+
+    async def _worker_loop(self, index: int) -> None:
+        owner = f"{self.worker_id}#{index}"
+        while True:
+            try:
+                job = await claim_question_job(owner, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Could not claim question job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run_job(job, owner)
+
+    async def _run_job(self, job: Dict[str, Any], owner: str) -> None:
+        job_id = job["_id"]
+        attempts = job.get("attempts", 1)
+        self.stats["running"] += 1
+        try:
+            if attempts > job.get("maxAttempts", self.max_attempts):
+                # Lease expired on the last attempt (worker died mid-job)
+                raise PermanentJobError(f"Gave up after {attempts - 1} attempts")
+
+            result = await asyncio.wait_for(self._handler(job), timeout=self.lease_seconds)
+            await finish_question_job(job_id, owner, result=result, retention_seconds=self.retention_seconds)
+            self.stats["succeeded"] += 1
+            logger.info(f"Question job {job_id} succeeded (attempt {attempts})")
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            if isinstance(e, PermanentJobError) or attempts >= job.get("maxAttempts", self.max_attempts):
+                await self._finish_quietly(job_id, owner, error=error)
+                self.stats["failed"] += 1
+                logger.error(f"Question job {job_id} failed: {error}")
+            else:
+                delay = self.backoff_seconds * (2 ** (attempts - 1))
+                retry_at = datetime.utcnow() + timedelta(seconds=delay)
+                await self._finish_quietly(job_id, owner, error=error, retry_at=retry_at)
+                self.stats["retried"] += 1
+                logger.warning(f"Question job {job_id} attempt {attempts} failed, retrying in {delay}s: {error}")
+        finally:
+            self.stats["running"] -= 1
+            self._notify(job_id)
+
+    async def _finish_quietly(self, job_id: str, owner: str, error: str,
+                              retry_at: Optional[datetime] = None) -> None:
+        try:
+            await finish_question_job(
+                job_id, owner, error=error, retry_at=retry_at,
+                retention_seconds=self.retention_seconds
+            )
+        except Exception as e:
+            # The lease expires and another worker retries the job
+            logger.error(f"Could not record outcome of question job {job_id}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "workers": len(self._workers),
+            "concurrency": self.concurrency,
+            "worker_id": self.worker_id
+        }
+
+
+def job_is_finished(job: Dict[str, Any]) -> bool:
+    return job.get("status") in (JOB_SUCCEEDED, JOB_FAILED)
+
+
+def serialize_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a job for the status and events endpoints"""
+    return {
+        "jobId": job["_id"],
+        "status": job["status"],
+        "attempts": job.get("attempts", 0),
+        "maxAttempts": job.get("maxAttempts"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "createdAt": job["createdAt"].isoformat() if job.get("createdAt") else None,
+        "completedAt": job["completedAt"].isoformat() if job.get("completedAt") else None
+    }
+
+
+# Singleton instance for reuse across the application
+_question_job_queue = None
+
+def get_question_job_queue() -> QuestionJobQueue:
+    """Get singleton instance of the question job queue"""
+    global _question_job_queue
+    if _question_job_queue is None:
+        _question_job_queue = QuestionJobQueue(
+            concurrency=Config.QUESTION_JOB_WORKERS,
+            poll_interval=Config.QUESTION_JOB_POLL_INTERVAL,
+            lease_seconds=Config.QUESTION_JOB_LEASE,
+            max_attempts=Config.QUESTION_JOB_MAX_ATTEMPTS,
+            backoff_seconds=Config.QUESTION_JOB_BACKOFF,
+            retention_seconds=Config.QUESTION_JOB_RETENTION
+        )
+    return _question_job_queue
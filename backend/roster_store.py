@@ -0,0 +1,146 @@
+import copy
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from config import Config
+from database import (
+    save_roster_snapshot, touch_roster_snapshot, load_roster_snapshot,
+    load_roster_snapshot_meta, acquire_roster_lease, release_roster_lease
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RosterStore:
+    """
+    Where the ProHub roster is published for every worker to read
+    Only the worker holding the refresh lease downloads from ProHub; the
+    others load each new roster version from the store.
+    """
+
+    backend = "base"
+
+    async def acquire_refresh_lease(self, owner: str, ttl: int) -> bool:
+        """Take or renew the refresh lease, returning True if owner holds it"""
+        raise NotImplementedError
+
+    async def release_refresh_lease(self, owner: str) -> None:
+        """Give up the refresh lease if owner holds it"""
+        raise NotImplementedError
+
+    async def publish(self, trainees: List[Dict[str, Any]], fetched_at: datetime,
+                      validators: Dict[str, Any], record_format: str) -> int:
+        """Store a new roster version and return its version number"""
+        raise NotImplementedError
+
+    async def touch(self, fetched_at: datetime) -> None:
+        """Mark the current version as confirmed by ProHub at fetched_at"""
+        raise NotImplementedError
+
+    async def load(self) -> Optional[Dict[str, Any]]:
+        """Load the current roster snapshot (with 'version'), if any"""
+        raise NotImplementedError
+
+    async def load_meta(self) -> Optional[Dict[str, Any]]:
+        """Load version, fetchedAt and validators without the roster itself"""
+        raise NotImplementedError
+
+
+class MongoRosterStore(RosterStore):
+    """Roster snapshot and refresh lease kept in MongoDB, shared by all workers"""
+
+    backend = "mongo"
+
+    async def acquire_refresh_lease(self, owner: str, ttl: int) -> bool:
+        return await acquire_roster_lease(owner, ttl)
+
+    async def release_refresh_lease(self, owner: str) -> None:
+        await release_roster_lease(owner)
+
+    async def publish(self, trainees: List[Dict[str, Any]], fetched_at: datetime,
+                      validators: Dict[str, Any], record_format: str) -> int:
+        return await save_roster_snapshot(trainees, fetched_at, validators, record_format=record_format)
+
+    async def touch(self, fetched_at: datetime) -> None:
+        await touch_roster_snapshot(fetched_at)
+
+    async def load(self) -> Optional[Dict[str, Any]]:
+        return await load_roster_snapshot()
+
+    async def load_meta(self) -> Optional[Dict[str, Any]]:
+        return await load_roster_snapshot_meta()
+
+
+class LocalRosterStore(RosterStore):
+    """
+    In-process store with the same semantics as MongoRosterStore
+    For single-worker development and for testing without external services
+    (several integrations sharing one LocalRosterStore behave like workers)
+    """
+
+    backend = "local"
+
+    def __init__(self):
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._lease_owner: Optional[str] = None
+        self._lease_expires_at = 0.0
+
+    async def acquire_refresh_lease(self, owner: str, ttl: int) -> bool:
+        now = time.monotonic()
+        if self._lease_owner not in (None, owner) and self._lease_expires_at > now:
+            return False
+        self._lease_owner = owner
+        self._lease_expires_at = now + ttl
+        return True
+
+    async def release_refresh_lease(self, owner: str) -> None:
+        if self._lease_owner == owner:
+            self._lease_owner = None
+
+    async def publish(self, trainees: List[Dict[str, Any]], fetched_at: datetime,
+                      validators: Dict[str, Any], record_format: str) -> int:
+        version = (self._snapshot or {}).get("version", 0) + 1
+        self._snapshot = {
+            "_id": "latest",
+            "trainees": copy.deepcopy(trainees),
+            "count": len(trainees),
+            "format": record_format,
+            "fetchedAt": fetched_at,
+            "validators": dict(validators or {}),
+            "version": version
+        }
+        return version
+
+    async def touch(self, fetched_at: datetime) -> None:
+        if self._snapshot is not None:
+            self._snapshot["fetchedAt"] = fetched_at
+
+    async def load(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._snapshot)
+
+    async def load_meta(self) -> Optional[Dict[str, Any]]:
+        if self._snapshot is None:
+            return None
+        return {key: value for key, value in self._snapshot.items() if key != "trainees"}
+
+
+ROSTER_STORE_BACKENDS = {
+    MongoRosterStore.backend: MongoRosterStore,
+    LocalRosterStore.backend: LocalRosterStore
+}
+
+
+def create_roster_store(backend: Optional[str] = None) -> RosterStore:
+    """
+    Create the roster store for the configured backend
+
+    Args:
+        backend: "mongo" or "local" (defaults to PROHUB_CACHE_BACKEND)
+    """
+    backend = backend or Config.PROHUB_CACHE_BACKEND
+    if backend not in ROSTER_STORE_BACKENDS:
+        logger.warning(f"Unknown PROHUB_CACHE_BACKEND '{backend}', using 'mongo'")
+        backend = MongoRosterStore.backend
+    return ROSTER_STORE_BACKENDS[backend]()
@@ -0,0 +1,27 @@
+from ai_service import AIFollowupService
+
+
+def _service() -> AIFollowupService:
+    # Parsing needs no Gemini client or database
+    return AIFollowupService.__new__(AIFollowupService)
+
+
+def test_short_response_is_not_padded_with_defaults():
+    questions = _service()._parse_questions_from_response(
+        "1. What did you change in the login flow today?\n2. Which tests cover it?"
+    )
+    assert questions == ["What did you change in the login flow today?", "Which tests cover it?"]
+
+
+def test_non_json_question_sets_need_three_parsed_questions():
+    service = _service()
+    assert service._parse_question_sets("1. What did you change in the login flow today?") == []
+    assert service._parse_question_sets(
+        "1. What did you change in the login flow today?\n"
+        "2. Which tests cover the new login flow?\n"
+        "3. What will you work on first tomorrow?"
+    ) == [[
+        "What did you change in the login flow today?",
+        "Which tests cover the new login flow?",
+        "What will you work on first tomorrow?"
+    ]]
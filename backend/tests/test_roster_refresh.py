@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+from integration import SNAPSHOT_FORMAT, ProHubIntegration, ProHubIntegrationError, TraineeRecord
+from roster_store import LocalRosterStore
+
+
+def _prohub_down(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(500, text="ProHub unavailable")
+
+
+def _make_worker(store: LocalRosterStore) -> ProHubIntegration:
+    """Integration sharing store with other workers, talking to a ProHub that is down"""
+    worker = ProHubIntegration(store=store)
+    worker._client = httpx.AsyncClient(transport=httpx.MockTransport(_prohub_down))
+    return worker
+
+
+async def _publish_old_roster(store: LocalRosterStore, age_seconds: float) -> None:
+    trainee = TraineeRecord("T001", "intern@example.com", "Intern", status="active")
+    await store.publish(
+        [trainee.to_dict()],
+        datetime.now() - timedelta(seconds=age_seconds),
+        validators={},
+        record_format=SNAPSHOT_FORMAT
+    )
+
+
+def test_follower_does_not_serve_shared_roster_past_hard_expiry():
+    async def scenario():
+        store = LocalRosterStore()
+        leader = _make_worker(store)
+        follower = _make_worker(store)
+        # The lease holder is alive but has not published a fresh roster in time
+        assert await store.acquire_refresh_lease(leader.worker_id, leader.lease_ttl)
+        await _publish_old_roster(store, follower.max_stale_age + 100)
+
+        with pytest.raises(ProHubIntegrationError):
+            await follower.fetch_all_trainees(force_refresh=True)
+        await leader.close()
+        await follower.close()
+
+    asyncio.run(scenario())
+
+
+def test_follower_serves_shared_roster_within_hard_expiry():
+    async def scenario():
+        store = LocalRosterStore()
+        leader = _make_worker(store)
+        follower = _make_worker(store)
+        assert await store.acquire_refresh_lease(leader.worker_id, leader.lease_ttl)
+        await _publish_old_roster(store, 10)
+
+        trainees = await follower.fetch_all_trainees(force_refresh=True)
+        assert [trainee.email for trainee in trainees] == ["intern@example.com"]
+        assert follower._cache_source == "shared"
+        await leader.close()
+        await follower.close()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_failed_parse_keeps_previous_validators(streaming):
+    bodies = [
+        (b'{"dataBundle": [{"id": "T001", "email": "intern@example.com", "name": "Intern"}]}', "v1"),
+        (b'{"dataBundle": [{"id": "T002", "email": ', "v2")
+    ]
+    sent_etags = []
+
+    def prohub(request: httpx.Request) -> httpx.Response:
+        sent_etags.append(request.headers.get("If-None-Match"))
+        body, etag = bodies[min(len(sent_etags), len(bodies)) - 1]
+        return httpx.Response(200, content=body, headers={"ETag": etag})
+
+    async def scenario():
+        worker = ProHubIntegration(store=LocalRosterStore())
+        worker.streaming_parse = streaming
+        worker._client = httpx.AsyncClient(transport=httpx.MockTransport(prohub))
+        await worker.fetch_all_trainees(force_refresh=True)
+        with pytest.raises(ProHubIntegrationError):
+            await worker.fetch_all_trainees(force_refresh=True)
+
+        assert worker._etag == "v1"
+        assert [trainee.email for trainee in worker._trainees_cache] == ["intern@example.com"]
+        with pytest.raises(ProHubIntegrationError):
+            await worker.fetch_all_trainees(force_refresh=True)
+        # The next conditional fetch still names the roster actually cached
+        assert sent_etags == [None, "v1", "v1"]
+        await worker.close()
+
+    asyncio.run(scenario())
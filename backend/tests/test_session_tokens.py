@@ -0,0 +1,35 @@
+import pytest
+
+import auth_tokens
+from auth_tokens import (
+    SessionTokenError, SessionTokenUnavailableError,
+    create_session_token, revoke_session_tokens, verify_session_token
+)
+from config import Config
+
+INTERN = {"intern_id": "T001", "name": "Intern", "email": "Intern@Example.com", "department": "IT"}
+
+
+@pytest.fixture(autouse=True)
+def token_secret(monkeypatch):
+    monkeypatch.setattr(Config, "SESSION_TOKEN_SECRET", "test-session-secret")
+    auth_tokens._revoked_emails.clear()
+
+
+def test_tokens_are_unavailable_without_a_dedicated_secret(monkeypatch):
+    token, _ = create_session_token(INTERN)
+    monkeypatch.setattr(Config, "SESSION_TOKEN_SECRET", None)
+
+    with pytest.raises(SessionTokenUnavailableError):
+        create_session_token(INTERN)
+    with pytest.raises(SessionTokenUnavailableError):
+        verify_session_token(token)
+
+
+def test_revoked_email_rejects_tokens_issued_before():
+    token, _ = create_session_token(INTERN)
+    assert verify_session_token(token)["intern_id"] == "T001"
+
+    revoke_session_tokens("intern@example.com")
+    with pytest.raises(SessionTokenError, match="revoked"):
+        verify_session_token(token)